@@ -1,3 +1,25 @@
-from .adsobinapi import adsobin, adsowritebin
+from .adsoheaderapi import adsoheader
+from .adsostats import adsostats
 
-__all__ = ["adsobin", "adsowritebin"]
+__all__ = ["adsobin", "adsowritebin", "adsoseries", "adsostats",
+           "adsoheader"]
+
+# Classes depending on numpy are imported on first access, so that the
+# command line tool can read the headers of a file without importing numpy
+lazy = {"adsobin": ".adsobinapi",
+        "adsowritebin": ".adsobinapi",
+        "adsoseries": ".adsoseriesapi"}
+
+
+def __getattr__(name):
+    if name in lazy:
+        from importlib import import_module
+        value = getattr(import_module(lazy[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(
+        __name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -33,39 +33,293 @@
 # import argparse
 # import logging
 # import os
+import json
+import mmap
+import os
+import queue
 import struct
+import threading
+import warnings
 from datetime import datetime, timedelta, timezone
+from time import monotonic, sleep
+from types import MappingProxyType
 
 import numpy as np
 # import pkg_resources
 
-# Size of data type and data padding
-size = {'int': 4,
-        'real': 4,
-        'char8': 8,
-        'pad': (4 + 4)}
+from .adsoheaderapi import (deadlineBlockSize, deadlineDatetime,
+                            detectByteOrder, parseRecord3, parseRecord4,
+                            parseRecord5, size)
+from .adsostats import adsostats
+
+
+def deadlineSlice(time, getDeadlineArray):
+    '''
+    Convert a slice of 0-based deadline indices or of datetimes (start
+    included, stop excluded) to a slice of deadline indices.
+    getDeadlineArray is called to get the deadlines only if needed.
+    '''
+    if time is None:
+        return slice(None)
+    if not isinstance(time, slice):
+        raise ValueError('time must be a slice.')
+    bounds = [time.start, time.stop]
+    if any(isinstance(bound, (datetime, np.datetime64))
+           for bound in bounds):
+        deadlines = getDeadlineArray()
+        for i, bound in enumerate(bounds):
+            if isinstance(bound, datetime):
+                if bound.tzinfo is not None:
+                    bound = bound.astimezone(timezone.utc)
+                bound = bound.replace(tzinfo=None)
+            if bound is not None:
+                bounds[i] = int(np.searchsorted(
+                    deadlines, np.datetime64(bound, 's')))
+    return slice(bounds[0], bounds[1], time.step)
 
 
 class adsowritebin(object):
     '''Class to write data to ADSO/BIN file.'''
 
-    def __init__(self):
+    def __init__(self, filename=None, byteorder='=', stats=False,
+                 mode='w'):
         '''
         Constructor
+        If filename is given the file is opened for writing and deadlines
+        are written to it with writeDeadline, otherwise putRecord* methods
+        return the packed records.
+        byteorder is the byte order of the output: '=' native (default),
+        '<' little-endian or '>' big-endian.
+        With mode='a' deadlines are appended to an existing file (which is
+        created if it does not exist): the byte order of the file is kept
+        and each new deadline must have the grid and the variables of the
+        last deadline of the file and follow it with the same time step.
+        An incomplete deadline at the end of the file, left by a writer
+        which did not complete it, is truncated.
+        If stats is True (or an adsostats object to be shared) bytes and
+        records written and the time spent in each method are accumulated
+        in the stats attribute. Methods are not instrumented otherwise.
         '''
+        if byteorder not in ('=', '<', '>'):
+            raise ValueError('Unknown byte order: {}'.format(byteorder))
+        if mode not in ('w', 'a'):
+            raise ValueError('Unknown mode: {}'.format(mode))
+        self.byteorder = byteorder
+        self.filename = filename
+        self.mode = mode
+        self.stats = None
+        if stats:
+            self.stats = stats if isinstance(stats, adsostats) \
+                else adsostats()
+            self.__instrument()
+        self.__file = None
+        # Header, datetime and time step of the last deadline written, to
+        # check the deadlines appended
+        self.__last = None
+        self.__lastDeadline = None
+        self.__step = None
+        if filename is not None:
+            if mode == 'a' and os.path.exists(filename) and \
+                    os.path.getsize(filename) > 0:
+                self.__openAppend()
+            else:
+                self.__file = open(filename, 'wb')
+
+    def __openAppend(self):
+        '''
+        Open the output file to append deadlines after its last complete
+        deadline.
+        '''
+        with warnings.catch_warnings():
+            # The incomplete deadline is truncated below
+            warnings.simplefilter('ignore')
+            data = adsobin(self.filename)
+        with data:
+            if self.byteorder != '=' and \
+                    np.dtype(self.byteorder + 'i4') != \
+                    np.dtype(data.byteorder + 'i4'):
+                raise ValueError('Byte order does not match {}.'.format(
+                    self.filename))
+            self.byteorder = data.byteorder
+            end = data.index['end']
+            if len(data) > 0:
+                self.__last = data.getHeader(len(data))
+                self.__lastDeadline = data.getDeadline(len(data))
+            if len(data) > 1:
+                self.__step = self.__lastDeadline - \
+                    data.getDeadline(len(data) - 1)
+        self.__file = open(self.filename, 'r+b')
+        if os.path.getsize(self.filename) > end:
+            warnings.warn('{}: incomplete deadline truncated.'.format(
+                self.filename))
+            self.__file.truncate(end)
+        self.__file.seek(end)
+
+    def __checkDeadline(self, header):
+        '''
+        Check that a deadline to be appended matches the last deadline of
+        the file.
+        '''
+        last = self.__last
+        for key in ('immai', 'jmmai', 'kmmai', 'nvar3d', 'nvar2d'):
+            if header['rec3'][key] != last['rec3'][key]:
+                raise ValueError('{} does not match the last deadline of '
+                                 '{}.'.format(key, self.filename))
+        # Record 4 is compared in single precision, as stored in the file
+        for key in ('sgrid', 'dxmai', 'dymai', 'xlso', 'ylso'):
+            if not np.array_equal(
+                    np.asarray(header['rec4'][key], dtype=np.float32),
+                    np.asarray(last['rec4'][key], dtype=np.float32)):
+                raise ValueError('{} does not match the last deadline of '
+                                 '{}.'.format(key, self.filename))
+        for key in ('nomvar3d', 'nomvar2d'):
+            if [name.strip() for name in header['rec5'][key]] != \
+                    [name.strip() for name in last['rec5'][key]]:
+                raise ValueError('{} does not match the last deadline of '
+                                 '{}.'.format(key, self.filename))
+
+        dtdeadline = deadlineDatetime(header['rec3'])
+        if self.__step is not None and \
+                dtdeadline != self.__lastDeadline + self.__step:
+            raise ValueError('Deadline {} does not follow {} with a time '
+                             'step of {}.'.format(dtdeadline,
+                                                  self.__lastDeadline,
+                                                  self.__step))
+        elif dtdeadline <= self.__lastDeadline:
+            raise ValueError('Deadline {} does not follow {}.'.format(
+                dtdeadline, self.__lastDeadline))
+
+    def __instrument(self):
+        '''
+        Wrap the methods of this object to update the stats object.
+        '''
+        def record(result):
+            return {'recordsWritten': 1, 'bytesWritten': len(result)}
+
+        def field(result):
+            return {'recordsWritten': 1,
+                    'bytesWritten': sum(len(chunk) for chunk in result)}
+
+        for name in ('putRecord1', 'putRecord2', 'putRecord3', 'putRecord4',
+                     'putRecord5'):
+            setattr(self, name, self.stats.wrap(name, getattr(self, name),
+                                                record))
+        # Fields are counted when they are packed
+        self.__packField = self.stats.wrap('packField', self.__packField,
+                                           field)
+        for name in ('putRecord7', 'writeDeadline'):
+            setattr(self, name, self.stats.wrap(name, getattr(self, name)))
+
+    def close(self):
+        '''
+        Close the output file.
+        '''
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def writeDeadline(self, header, fields):
+        '''
+        Write a whole deadline to the output file.
+        header is a dictionary with the content of records 1 to 5:
+            {'rec1': ident1, 'rec2': model1,
+             'rec3': rec3, 'rec4': rec4, 'rec5': rec5}
+        as returned by the corresponding adsobin.getRecord* methods.
+        fields is either a dictionary {variable: array} with arrays shaped
+        as (x, y, z) or (x, y), as returned by adsobin.getRecord7, or a
+        dictionary {'var3d': [...], 'var2d': [...]} with arrays following
+        the putRecord7 convention.
+        Each field is written directly from the array buffer, so that only
+        one field at a time is held in memory. If writing fails the
+        incomplete deadline is removed from the file.
+        '''
+        if self.__file is None:
+            raise ValueError('No output file to write the deadline to.')
+        if self.__last is not None:
+            self.__checkDeadline(header)
+        rec3 = header['rec3']
+        rec5 = header['rec5']
+        if 'var3d' in fields and 'var2d' in fields:
+            order = 'C'
+            var3d = fields['var3d']
+            var2d = fields['var2d']
+        else:
+            order = 'F'
+            # Variable names can be given with or without padding
+            var3d = [fields.get(name, fields.get(name.strip()))
+                     for name in rec5['nomvar3d']]
+            var2d = [fields.get(name, fields.get(name.strip()))
+                     for name in rec5['nomvar2d']]
+            if any(field is None for field in var3d + var2d):
+                raise ValueError('Fields do not match the variables of '
+                                 'record 5.')
+        if len(var3d) != len(rec5['nomvar3d']) or \
+                len(var2d) != len(rec5['nomvar2d']):
+            raise ValueError('Fields do not match the variables of record 5.')
+
+        start = self.__file.tell()
+        try:
+            self.__file.write(self.putRecord1(header['rec1']))
+            self.__file.write(self.putRecord2(header['rec2']))
+            self.__file.write(self.putRecord3(rec3))
+            self.__file.write(self.putRecord4(header['rec4'], rec3['kmmai']))
+            self.__file.write(self.putRecord5(rec5))
+            nReals3d = rec3['immai'] * rec3['jmmai'] * rec3['kmmai']
+            nReals2d = rec3['immai'] * rec3['jmmai']
+            for field in var3d:
+                for chunk in self.__packField(field, nReals3d, order):
+                    self.__file.write(chunk)
+            for field in var2d:
+                for chunk in self.__packField(field, nReals2d, order):
+                    self.__file.write(chunk)
+            self.__file.flush()
+        except BaseException:
+            # Do not leave an incomplete deadline in the file
+            self.__file.seek(start)
+            self.__file.truncate()
+            raise
+
+        if self.mode == 'a':
+            dtdeadline = deadlineDatetime(rec3)
+            if self.__lastDeadline is not None and self.__step is None:
+                self.__step = dtdeadline - self.__lastDeadline
+            self.__last = header
+            self.__lastDeadline = dtdeadline
+
+    def __packField(self, field, nReals, order='C'):
+        '''
+        Returns record markers and data buffer of a field as a list.
+        The field is flattened in the given order and cast to float32 (with
+        the output byte order) only if needed: no data is copied if it is
+        already contiguous.
+        '''
+        dtype = np.dtype(np.float32).newbyteorder(self.byteorder)
+        data = np.ravel(np.asarray(field, dtype=dtype), order=order)
+        if data.size != nReals:
+            raise ValueError('Field of size {} instead of {}.'.format(
+                data.size, nReals))
+        nlen = nReals * size['real']
+        pad = struct.pack(self.byteorder + 'i', nlen)
+        return [pad, memoryview(data).cast('B'), pad]
 
     def putRecord1(self, ident1):
-        pad1 = struct.pack('@i', size['char8'])
+        pad1 = struct.pack(self.byteorder + 'i', size['char8'])
         typedef = '@' + str(size['char8']) + 's'
         idpack = struct.pack(typedef, str.encode(ident1))
-        pad2 = struct.pack('@i', size['char8'])
+        pad2 = struct.pack(self.byteorder + 'i', size['char8'])
         return pad1+idpack+pad2
 
     def putRecord2(self, model1):
-        pad1 = struct.pack('@i', size['char8'])
+        pad1 = struct.pack(self.byteorder + 'i', size['char8'])
         typedef = '@' + str(size['char8']) + 's'
         mopack = struct.pack(typedef, str.encode(model1))
-        pad2 = struct.pack('@i', size['char8'])
+        pad2 = struct.pack(self.byteorder + 'i', size['char8'])
         return pad1+mopack+pad2
 
     def putRecord3(self, rec3):
@@ -98,9 +352,9 @@ class adsowritebin(object):
         l0.append(0)
         l0.append(0)
         nlen = size['int']*27
-        pad1 = struct.pack('@i', nlen)
-        r3pack = struct.pack('@27i', *l0)
-        pad2 = struct.pack('@i', nlen)
+        pad1 = struct.pack(self.byteorder + 'i', nlen)
+        r3pack = struct.pack(self.byteorder + '27i', *l0)
+        pad2 = struct.pack(self.byteorder + 'i', nlen)
         return pad1+r3pack+pad2
     # ## DRAFT
     # bytes=[... for i in range()] # list
@@ -122,11 +376,11 @@ class adsowritebin(object):
         fnum.append(0)
         fnum.append(rec4['ztop'])
         nReals = 11 + kmmai
-        typedef = '@' + str(nReals) + 'f'
+        typedef = self.byteorder + str(nReals) + 'f'
         nlen = size['real']*nReals
-        pad1 = struct.pack('@i', nlen)
+        pad1 = struct.pack(self.byteorder + 'i', nlen)
         r4pack = struct.pack(typedef, *fnum)
-        pad2 = struct.pack('@i', nlen)
+        pad2 = struct.pack(self.byteorder + 'i', nlen)
         return pad1+r4pack+pad2
 
     def putRecord5(self, rec5):
@@ -136,8 +390,8 @@ class adsowritebin(object):
         nvar2d = len(rec5['nomvar2d'])
 
         nlen = (nreper + 2 * nvar3d + 2 * nvar2d)*size['char8']
-        pad1 = struct.pack('@i', nlen)
-        pad2 = struct.pack('@i', nlen)
+        pad1 = struct.pack(self.byteorder + 'i', nlen)
+        pad2 = struct.pack(self.byteorder + 'i', nlen)
 
         typedef = '@' + str(size['char8']) + 's'
         r5pack = b''
@@ -162,64 +416,750 @@ class adsowritebin(object):
         # tables are numpy arrays order in following convention:
         # np.array[kmmai,jmmai,immai], # which have been pre-stored in
         # order 'C': (i+(j-1)*immai+(k-1)*immai*jmmai)
+        r7pack = []
+        for field in rec7['var3d']:
+            r7pack += self.__packField(field, immai*jmmai*kmmai)
+        for field in rec7['var2d']:
+            r7pack += self.__packField(field, immai*jmmai)
+        return b''.join(r7pack)
 
-        nvar3d = len(rec7['var3d'])
-        nvar2d = len(rec7['var2d'])
 
-        r7pack = b''
-        for i in range(nvar3d):
-            l1d = list(rec7['var3d'][i].reshape(immai*jmmai*kmmai))
-            # print('nvar3d:',i,rec7['var3d'][i])
-            nReals = immai*jmmai*kmmai
-            nlen = nReals*size['real']
-            pad1 = struct.pack('@i', nlen)
-            pad2 = struct.pack('@i', nlen)
-            typedef = '@' + str(nReals) + 'f'
-            r7pack += pad1+struct.pack(typedef, *l1d)+pad2
-        for i in range(nvar2d):
-            l2d = list(rec7['var2d'][i].reshape(immai*jmmai))
-            # print('nvar2d:',i,rec7['var2d'][i])
-            nReals = immai*jmmai
-            nlen = nReals*size['real']
-            pad1 = struct.pack('@i', nlen)
-            pad2 = struct.pack('@i', nlen)
-            typedef = '@' + str(nReals) + 'f'
-            r7pack += pad1+struct.pack(typedef, *l2d)+pad2
-        return r7pack
+class preadfile(object):
+    '''
+    Read-only file accessed with positional reads (os.pread), which do not
+    share a file position and release the GIL: many threads can read from
+    the same file at once without locks.
+    '''
+
+    def __init__(self, filename):
+        '''
+        Constructor: open the file for positional reads.
+        '''
+        if not hasattr(os, 'pread'):
+            raise ValueError('Positional reads are not available on this '
+                             'platform.')
+        self.__fd = os.open(filename, os.O_RDONLY)
+        self.__size = os.fstat(self.__fd).st_size
+
+    def close(self):
+        '''
+        Close the file.
+        '''
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+    def __len__(self):
+        return self.__size
+
+    def __getitem__(self, key):
+        '''
+        Returns the bytes of a slice of the file.
+        '''
+        start, stop, step = key.indices(self.__size)
+        if step != 1:
+            raise ValueError('Only contiguous slices can be read.')
+        return os.pread(self.__fd, max(stop - start, 0), start)
+
+    def readinto(self, buffer, offset):
+        '''
+        Fill buffer with the bytes of the file starting at offset.
+        '''
+        view = memoryview(buffer).cast('B')
+        while len(view) > 0:
+            if hasattr(os, 'preadv'):
+                nBytes = os.preadv(self.__fd, [view], offset)
+            else:
+                chunk = os.pread(self.__fd, len(view), offset)
+                nBytes = len(chunk)
+                view[:nBytes] = chunk
+            if nBytes == 0:
+                raise Exception('ADSOpy error: unexpected end of file.')
+            view = view[nBytes:]
+            offset += nBytes
+
+
+class p2percentile(object):
+    '''
+    Streaming estimate of a percentile of each element of a sequence of
+    arrays with the P-square algorithm (R. Jain and I. Chlamtac, 1985):
+    five markers are kept for each element instead of the values.
+    '''
+
+    def __init__(self, percentile, shape):
+        '''
+        Constructor: percentile in [0, 100] and shape of the arrays.
+        '''
+        self.percentile = percentile
+        self.shape = tuple(shape)
+        self.__n = 0
+        q = percentile / 100
+        self.__increments = np.array([0, q / 2, q, (1 + q) / 2, 1])
+        nValues = int(np.prod(self.shape))
+        self.__heights = np.empty((5, nValues))
+        # 0-based positions of the markers
+        self.__positions = np.repeat(np.arange(5.0)[:, np.newaxis], nValues,
+                                     axis=1)
+
+    def add(self, values):
+        '''
+        Add an array of values.
+        '''
+        values = np.asarray(values, dtype=np.float64)
+        values = values.reshape(-1, order='F')
+        h = self.__heights
+        pos = self.__positions
+        if self.__n < 5:
+            h[self.__n] = values
+            self.__n += 1
+            if self.__n == 5:
+                h.sort(axis=0)
+            return
+        self.__n += 1
+        np.minimum(h[0], values, out=h[0])
+        np.maximum(h[4], values, out=h[4])
+        # Markers above the cell of the value move one position up
+        k = (values >= h[1]).astype(np.int8)
+        k += values >= h[2]
+        k += values >= h[3]
+        for i in range(1, 5):
+            pos[i] += k < i
+
+        desired = (self.__n - 1) * self.__increments
+        for i in (1, 2, 3):
+            # Only the markers far from their desired position are moved
+            d = desired[i] - pos[i]
+            move = np.flatnonzero(((d >= 1) & (pos[i + 1] - pos[i] > 1)) |
+                                  ((d <= -1) & (pos[i - 1] - pos[i] < -1)))
+            if len(move) == 0:
+                continue
+            sign = np.sign(d[move])
+            hl, hi, hu = h[i - 1, move], h[i, move], h[i + 1, move]
+            nl, ni, nu = pos[i - 1, move], pos[i, move], pos[i + 1, move]
+            parabolic = hi + sign / (nu - nl) * (
+                (ni - nl + sign) * (hu - hi) / (nu - ni) +
+                (nu - ni - sign) * (hi - hl) / (ni - nl))
+            linear = np.where(sign > 0, hi + (hu - hi) / (nu - ni),
+                              hi - (hl - hi) / (nl - ni))
+            h[i, move] = np.where((hl < parabolic) & (parabolic < hu),
+                                  parabolic, linear)
+            pos[i, move] += sign
+
+    def result(self):
+        '''
+        Returns the estimated percentile, exact up to 5 values.
+        '''
+        if self.__n <= 5:
+            value = np.percentile(self.__heights[:self.__n], self.percentile,
+                                  axis=0)
+        else:
+            value = self.__heights[2].copy()
+        return value.reshape(self.shape, order='F')
 
 
 class adsobin(object):
     '''Class to read data from ADSO/BIN file.'''
 
-    def __init__(self, filename):
+    # Version of the sidecar index file format
+    indexVersion = 3
+
+    def __init__(self, filename, storage='mmap', sidecar=False, scan=False,
+                 stats=False):
         '''
-        Consutctor: open and read ADSO/BIN file
+        Consutctor: open ADSO/BIN file
+
+        storage selects how the file content is accessed:
+            'mmap'   -> the file is memory mapped and only the bytes
+                        actually requested are read from disk (default)
+            'memory' -> the whole file is read in memory at once
+            'pread'  -> fields are read with positional reads into new
+                        arrays: reads do not share a file position and
+                        release the GIL, so that many threads can read
+                        from the same adsobin at once
+        If sidecar is True the index of the file is read from the sidecar
+        index file (filename + '.idx') when it is up to date, and written
+        otherwise (see writeIndex).
+        Files whose size is not a multiple of the first deadline block, or
+        whose last deadline does not match the first one, are indexed by
+        scanning the record markers of all deadlines (see scan). With
+        scan=True the markers are always scanned.
+        If stats is True (or an adsostats object to be shared) bytes and
+        records read, cache hits and misses and the time spent in each
+        method are accumulated in the stats attribute. Methods are not
+        instrumented otherwise.
         '''
 
         self.filename = filename
-        with open(self.filename, 'rb') as f:
-            self.__data = f.read()
+        self.storage = storage
+        self.sidecar = sidecar
+        self.__scan = scan
+        self.__data = b''
+        self.stats = None
+        if stats:
+            self.stats = stats if isinstance(stats, adsostats) \
+                else adsostats()
+            self.__instrument()
+        self.reindex()
+
+    def __instrument(self):
+        '''
+        Wrap the methods of this object to update the stats object.
+        '''
+        stats = self.stats
+
+        def chunk(result):
+            return {'recordsParsed': 1,
+                    'bytesRead': len(result[1]) + size['pad']}
+
+        def array(result):
+            return {'bytesRead': result.nbytes}
+
+        def index(result):
+            return {'cacheMisses' if result is None else 'cacheHits': 1}
+
+        getDeadlineArray = self.getDeadlineArray
+
+        def cachedDeadlineArray():
+            stats.add(**{'cacheMisses' if self.__deadlineArray is None
+                         else 'cacheHits': 1})
+            return getDeadlineArray()
+
+        getMinMax = self.getMinMax
+
+        def cachedMinMax():
+            stats.add(**{'cacheMisses' if self.__minmax is None
+                         else 'cacheHits': 1})
+            return getMinMax()
+
+        self.__readADSOChunk = stats.wrap('readADSOChunk',
+                                          self.__readADSOChunk, chunk)
+        self.__readArray = stats.wrap('readArray', self.__readArray, array)
+        self.readIndex = stats.wrap('readIndex', self.readIndex, index)
+        self.getDeadlineArray = stats.wrap('getDeadlineArray',
+                                           cachedDeadlineArray)
+        self.getMinMax = stats.wrap('getMinMax', cachedMinMax)
+        for name in ('reindex', 'scan', 'getRecord1', 'getRecord2',
+                     'getRecord3', 'getRecord4', 'getRecord5', 'getRecord7',
+                     'getSlice', 'getDataset', 'readMany', 'getDeadlines',
+                     'getPointSeries', 'getStatistics', 'getExceedances',
+                     'getHeightSlices'):
+            setattr(self, name, stats.wrap(name, getattr(self, name)))
+
+    def reindex(self):
+        '''
+        Open the file and build the index of its content.
+        The index is built once when the file is opened: call this method
+        again to rebuild it if the file changed since then.
+        '''
+        self.close()
+        self.__data = self.__openStorage()
+        self.__deadlineArray = None
+        self.__minmax = None
+        self.__heightWeights = {}
+
+        header = self.readIndex() if self.sidecar else None
+        if header is not None:
+            self.byteorder = header['byteorder']
+        else:
+            self.byteorder = self.__detectByteOrder()
+        self.index = self.__buildIndex(header)
+        # Size and offset of the records of the first deadline
+        self.size = dict(self.index['layouts'][0]['size'])
+        self.offset = dict(self.index['layouts'][0]['offset'])
+        if self.sidecar and header is None:
+            try:
+                self.writeIndex()
+            except OSError as e:
+                warnings.warn('Cannot write index file: {}'.format(e))
 
-        # Get the size of records and deadlne
-        self.size = self.getDeadlineBlockSize()
+    def __buildIndex(self, header=None):
+        '''
+        Returns read-only dictionary with the parsed header of the file:
+            'rec1', ..., 'rec5' -> header records of the first deadline
+            'variables'         -> variable name: ('3D' or '2D', position)
+            'fields'            -> variable name: (offset, shape) where
+                                   offset is the position of the field
+                                   data in the deadline block
+            'deadlines'         -> offset of each deadline block
+            'layouts'           -> distinct layouts of the deadline blocks
+                                   (see __buildLayout)
+            'layout'            -> layout of each deadline block
+            'uniform'           -> True if all the deadlines have the same
+                                   layout and are contiguous
+            'end'               -> offset following the last complete
+                                   deadline
+        If header is given (from the sidecar index file) the file is not
+        parsed.
+        '''
+        if header is not None:
+            layouts = [self.__buildLayout(0, layout)
+                       for layout in header['layouts']]
+            deadlines = np.array(header['deadlines'], dtype=np.int64)
+            layout = np.array(header['layout'], dtype=np.int64)
+            end = header['end']
+        else:
+            try:
+                layouts = [self.__buildLayout(0)]
+            except (struct.error, IndexError, ValueError):
+                raise Exception('ADSOpy error: cannot parse the header of '
+                                '{}.'.format(self.filename))
+            blockSize = layouts[0]['size']['blockSize']
+            nDeadlines = len(self.__data) // blockSize
+            if not self.__scan and \
+                    len(self.__data) % blockSize == 0 and \
+                    self.__sameLayout(layouts[0], (nDeadlines - 1) *
+                                      blockSize):
+                deadlines = np.arange(nDeadlines, dtype=np.int64) * \
+                    blockSize
+                layout = np.zeros(nDeadlines, dtype=np.int64)
+                end = len(self.__data)
+            else:
+                deadlines, layout, scanned, end = self.scan()
+                # A file still being written may have no complete deadline:
+                # keep the layout of its first header
+                layouts = scanned or layouts
+                deadlines = np.array(deadlines, dtype=np.int64)
+                layout = np.array(layout, dtype=np.int64)
+                if end < len(self.__data):
+                    warnings.warn('{}: incomplete deadline after {} '
+                                  'deadlines ignored.'.format(
+                                      self.filename, len(deadlines)))
+        deadlines.flags.writeable = False
+        layout.flags.writeable = False
+        blockSize = layouts[0]['size']['blockSize']
+        uniform = len(layouts) == 1 and \
+            np.array_equal(deadlines, np.arange(len(deadlines)) * blockSize)
+
+        self.index = {'deadlines': deadlines,
+                      'layouts': tuple(layouts),
+                      'layout': layout,
+                      'uniform': uniform,
+                      'end': end}
+        if header is not None:
+            self.index['rec1'] = header['rec1']
+            self.index['rec2'] = header['rec2']
+        else:
+            self.index['rec1'] = self.__parseIdent(
+                layouts[0]['offset']['rec1'])
+            self.index['rec2'] = self.__parseIdent(
+                layouts[0]['offset']['rec2'])
+        for key in ('rec3', 'rec4', 'rec5', 'variables', 'fields'):
+            self.index[key] = layouts[0][key]
+        return MappingProxyType(self.index)
+
+    def __buildLayout(self, start, header=None):
+        '''
+        Returns read-only dictionary with the layout of the deadline block
+        at offset start:
+            'size', 'offset'       -> size and offset of each record
+            'rec3', 'rec4', 'rec5' -> header records
+            'variables', 'fields'  -> as in the index
+        If header is given (records 3 to 5 from the sidecar index file) the
+        file is not parsed.
+        '''
+        if header is not None:
+            rec3 = header['rec3']
+            rec4 = dict(header['rec4'], sgrid=tuple(header['rec4']['sgrid']))
+            rec5 = header['rec5']
+            blockSize = self.getDeadlineBlockSize(rec3)
+            offset = self.__recordOffsets(blockSize)
+        else:
+            # Records 1 and 2 have fixed size
+            rec3 = self.getRecord3(offset=start + 2 * (size['char8'] +
+                                                       size['pad']))
+            blockSize = self.getDeadlineBlockSize(rec3)
+            offset = self.__recordOffsets(blockSize)
+            rec4 = self.__parseRecord4(start + offset['rec4'], rec3)
+            rec5 = self.__parseRecord5(start + offset['rec5'], rec3)
+
+        nx = rec3['immai']
+        ny = rec3['jmmai']
+        nz = rec3['kmmai']
+        variables = {}
+        fields = {}
+        fieldOffset = offset['rec7'] + int(size['pad'] / 2)
+        for i, name in enumerate(rec5['nomvar3d']):
+            variables.setdefault(name.strip(), ('3D', i))
+            fields.setdefault(name.strip(), (fieldOffset, (nx, ny, nz)))
+            fieldOffset += nx * ny * nz * size['real'] + size['pad']
+        for i, name in enumerate(rec5['nomvar2d']):
+            variables.setdefault(name.strip(), ('2D', i))
+            fields.setdefault(name.strip(), (fieldOffset, (nx, ny)))
+            fieldOffset += nx * ny * size['real'] + size['pad']
+
+        return MappingProxyType({
+            'size': MappingProxyType(blockSize),
+            'offset': MappingProxyType(offset),
+            'rec3': MappingProxyType(dict(rec3)),
+            'rec4': MappingProxyType(rec4),
+            'rec5': MappingProxyType(
+                {key: tuple(value) for key, value in rec5.items()}),
+            'variables': MappingProxyType(variables),
+            'fields': MappingProxyType(fields)})
+
+    def __recordOffsets(self, blockSize):
+        '''
+        Returns dictionary with the offset of each record in the deadline
+        block, given the size of the records.
+        '''
         # Single deadline offsets
         # to get each deadline offset you need to sum the proper deadline
         # blocksize
-        self.offset = {
-                'rec1': 0,
-                'rec2': self.size['rec1'],
-                'rec3': (self.size['rec1'] + self.size['rec2']),
-                'rec4': (self.size['rec1'] + self.size['rec2'] +
-                         self.size['rec3']),
-                'rec5': (self.size['rec1'] + self.size['rec2'] +
-                         self.size['rec3'] + self.size['rec4']),
-                'rec6': (self.size['rec1'] + self.size['rec2'] +
-                         self.size['rec3'] + self.size['rec4'] +
-                         self.size['rec5']),
-                'rec7': (self.size['rec1'] + self.size['rec2'] +
-                         self.size['rec3'] + self.size['rec4'] +
-                         self.size['rec5'] + self.size['rec6'])
-                }
+        return {'rec1': 0,
+                'rec2': blockSize['rec1'],
+                'rec3': (blockSize['rec1'] + blockSize['rec2']),
+                'rec4': (blockSize['rec1'] + blockSize['rec2'] +
+                         blockSize['rec3']),
+                'rec5': (blockSize['rec1'] + blockSize['rec2'] +
+                         blockSize['rec3'] + blockSize['rec4']),
+                'rec6': (blockSize['rec1'] + blockSize['rec2'] +
+                         blockSize['rec3'] + blockSize['rec4'] +
+                         blockSize['rec5']),
+                'rec7': (blockSize['rec1'] + blockSize['rec2'] +
+                         blockSize['rec3'] + blockSize['rec4'] +
+                         blockSize['rec5'] + blockSize['rec6'])}
+
+    def __sameLayout(self, layout, start):
+        '''
+        Check that the deadline block at offset start has the given layout.
+        '''
+        try:
+            other = self.__buildLayout(start)
+        except (struct.error, UnicodeDecodeError):
+            return False
+        return other['size'] == layout['size'] and \
+            other['rec5'] == layout['rec5']
+
+    def scan(self, start=0):
+        '''
+        Walk the record markers of the file from offset start, jumping from
+        each record to the following one, and return the tuple
+            (offsets, layout ids, layouts, end)
+        with the offset and the layout id of each complete deadline, the
+        list of distinct layouts (see __buildLayout) and the offset
+        following the last complete deadline.
+        Only records 3 and 5 are read, to know the number and the size of
+        the records of each deadline. The scan stops at the first deadline
+        which is truncated or whose record markers are not consistent.
+        '''
+        nBytes = len(self.__data)
+        marker = struct.Struct(self.byteorder + 'I')
+
+        def skipRecord(rStart, rLength):
+            # End of the record at rStart, or None if it is not complete
+            if rStart + marker.size > nBytes:
+                return None
+            length, = marker.unpack(self.__data[rStart:rStart + marker.size])
+            rEnd = rStart + length + size['pad']
+            if length != rLength or rEnd > nBytes or \
+                    marker.unpack(self.__data[rEnd - marker.size:rEnd])[0] \
+                    != length:
+                return None
+            return rEnd
+
+        offsets = []
+        layoutIds = []
+        layouts = []
+        keys = {}
+        end = start
+        while True:
+            rStart = end
+            for rLength in (size['char8'], size['char8']):
+                rStart = skipRecord(rStart, rLength)
+                if rStart is None:
+                    break
+            if rStart is None or \
+                    skipRecord(rStart, 27 * size['int']) is None:
+                break
+            rec3 = self.getRecord3(offset=rStart)
+            blockSize = self.getDeadlineBlockSize(rec3)
+            rStart += blockSize['rec3']
+            nx = rec3['immai']
+            ny = rec3['jmmai']
+            nz = rec3['kmmai']
+            rLengths = [blockSize['rec4'] - size['pad'],
+                        blockSize['rec5'] - size['pad']]
+            if blockSize['rec6'] != 0:
+                rLengths.append(blockSize['rec6'] - size['pad'])
+            rLengths += [nx * ny * nz * size['real']] * rec3['nvar3d']
+            rLengths += [nx * ny * size['real']] * rec3['nvar2d']
+            rec5 = rStart + blockSize['rec4']
+            for rLength in rLengths:
+                rStart = skipRecord(rStart, rLength)
+                if rStart is None:
+                    break
+            if rStart is None:
+                break
+
+            # Deadlines with the same sizes and variables share the layout
+            key = (tuple(blockSize.values()),
+                   bytes(self.__data[rec5:rec5 + blockSize['rec5']]))
+            if key not in keys:
+                keys[key] = len(layouts)
+                layouts.append(self.__buildLayout(end))
+            offsets.append(end)
+            layoutIds.append(keys[key])
+            end = rStart
+        return offsets, layoutIds, layouts, end
+
+    def follow(self, interval=1.0, timeout=None):
+        '''
+        Follow a file which is being written by a running model: poll the
+        size of the file every interval seconds and yield
+        (deadline, datetime) for each deadline completed after the call,
+        with the 1-based deadline number.
+        Only the bytes following the last indexed deadline are scanned:
+        the deadlines already in the index are never read again.
+        The iteration stops when the file does not grow for timeout
+        seconds (it never stops if timeout is None).
+        '''
+        lastGrowth = monotonic()
+        while True:
+            first = len(self)
+            if self.__growStorage():
+                lastGrowth = monotonic()
+                self.__extendIndex()
+            for nd in range(first, len(self)):
+                yield nd + 1, self.getDeadline(nd + 1)
+            if timeout is not None and monotonic() - lastGrowth >= timeout:
+                return
+            sleep(interval)
+
+    def __growStorage(self):
+        '''
+        Extend the buffer holding the content of the file to the current
+        size of the file. Returns True if the file grew.
+        '''
+        if os.stat(self.filename).st_size <= len(self.__data):
+            return False
+        if self.storage == 'memory':
+            # Read only the bytes appended to the file
+            with open(self.filename, 'rb') as f:
+                f.seek(len(self.__data))
+                self.__data += f.read()
+        else:
+            data = self.__data
+            self.__data = self.__openStorage()
+            self.__closeStorage(data)
+        return True
+
+    def __extendIndex(self):
+        '''
+        Add to the index the deadlines completed after the end of the
+        index. Returns the number of new deadlines.
+        '''
+        offsets, layoutIds, layouts, end = self.scan(self.index['end'])
+        if len(offsets) == 0:
+            return 0
+
+        # Map the layouts of the new deadlines to the known ones
+        known = list(self.index['layouts'])
+        ids = []
+        for layout in layouts:
+            for nl, other in enumerate(known):
+                if other['size'] == layout['size'] and \
+                        other['rec5'] == layout['rec5']:
+                    ids.append(nl)
+                    break
+            else:
+                ids.append(len(known))
+                known.append(layout)
+
+        first = len(self)
+        index = dict(self.index)
+        deadlines = np.concatenate([index['deadlines'],
+                                    np.array(offsets, dtype=np.int64)])
+        layout = np.concatenate([index['layout'],
+                                 np.array([ids[nl] for nl in layoutIds],
+                                          dtype=np.int64)])
+        deadlines.flags.writeable = False
+        layout.flags.writeable = False
+        blockSize = known[0]['size']['blockSize']
+        index.update({
+            'deadlines': deadlines,
+            'layouts': tuple(known),
+            'layout': layout,
+            'uniform': len(known) == 1 and np.array_equal(
+                deadlines, np.arange(len(deadlines)) * blockSize),
+            'end': end})
+        self.index = MappingProxyType(index)
+
+        # Decode only the datetimes of the new deadlines
+        if self.__deadlineArray is not None:
+            dtdeadlines = np.concatenate([
+                self.__deadlineArray,
+                self.__decodeDeadlines(first + 1, len(offsets))])
+            dtdeadlines.flags.writeable = False
+            self.__deadlineArray = dtdeadlines
+        self.__minmax = None
+        return len(offsets)
+
+    def __detectByteOrder(self):
+        '''
+        Returns the byte order of the file ('<' or '>') from the record
+        markers of record 1 (8 bytes) and record 3 (27 integers).
+        '''
+        return detectByteOrder(self.__data[0:36])
+
+    def __indexKey(self):
+        '''
+        Returns the size and modification time identifying the current
+        content of the file.
+        '''
+        stat = os.stat(self.filename)
+        return {'fileSize': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    def readIndex(self):
+        '''
+        Returns the content of the sidecar index file, or None if it does
+        not exist or it is out of date.
+        '''
+        try:
+            with open(self.filename + '.idx', 'r') as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        key = self.__indexKey()
+        if header.get('version') != self.indexVersion or \
+                header.get('fileSize') != key['fileSize'] or \
+                header.get('mtime') != key['mtime']:
+            return None
+        self.__deadlineArray = np.array(header['datetimes'],
+                                        dtype='datetime64[s]')
+        self.__deadlineArray.flags.writeable = False
+        if 'minmax' in header:
+            self.__minmax = {name: np.array(values, dtype=np.float32)
+                             for name, values in header['minmax'].items()}
+        return header
+
+    def writeIndex(self, minmax=False):
+        '''
+        Write the sidecar index file (filename + '.idx'): a small JSON file
+        with the header records, the offsets, the layouts and the datetimes
+        of the deadlines and, if minmax is True, the min/max values of each
+        variable in each deadline (see getMinMax).
+        The index file is keyed by size and modification time of the
+        ADSO/BIN file and it is ignored as soon as the file changes.
+        '''
+        header = {'version': self.indexVersion}
+        header.update(self.__indexKey())
+        header['byteorder'] = self.byteorder
+        header['rec1'] = self.index['rec1']
+        header['rec2'] = self.index['rec2']
+        header['layouts'] = [{rec: dict(layout[rec])
+                              for rec in ('rec3', 'rec4', 'rec5')}
+                             for layout in self.index['layouts']]
+        header['layout'] = self.index['layout'].tolist()
+        header['deadlines'] = self.index['deadlines'].tolist()
+        header['end'] = self.index['end']
+        header['datetimes'] = self.getDeadlineArray().astype(
+            np.int64).tolist()
+        if minmax:
+            header['minmax'] = {name: values.tolist() for name, values in
+                                self.getMinMax().items()}
+        # Replace the index file at once
+        tmpname = self.filename + '.idx.tmp'
+        with open(tmpname, 'w') as f:
+            json.dump(header, f)
+        os.replace(tmpname, self.filename + '.idx')
+
+    def getMinMax(self):
+        '''
+        Returns dictionary {variable: array} with the min/max values of
+        each variable in each deadline, as an array shaped as
+        (deadlines, 2). Values are read from the sidecar index file if
+        available. If the layout of the deadlines changes along the file,
+        the values of the deadlines without the variable are NaN.
+        '''
+        if self.__minmax is None:
+            names = []
+            for layout in self.index['layouts']:
+                names += [name for name in layout['fields']
+                          if name not in names]
+            minmax = {name: np.full((len(self), 2), np.nan,
+                                    dtype=np.float32)
+                      for name in names}
+            for nd in range(len(self)):
+                for name, field in self.getRecord7(nd + 1).items():
+                    minmax[name.strip()][nd] = (field.min(), field.max())
+            self.__minmax = minmax
+        return self.__minmax
+
+    def __deadlineOffset(self, deadline):
+        '''
+        Returns the offset of the 1-based deadline.
+        '''
+        nDeadlines = len(self.index['deadlines'])
+        if deadline < 1 or deadline > nDeadlines:
+            raise ValueError('deadline {} out of range [1, {}].'.format(
+                deadline, nDeadlines))
+        return int(self.index['deadlines'][deadline - 1])
+
+    def __layout(self, deadline):
+        '''
+        Returns the layout of the 1-based deadline.
+        '''
+        self.__deadlineOffset(deadline)
+        return self.index['layouts'][self.index['layout'][deadline - 1]]
+
+    def __field(self, variable, deadline=None):
+        '''
+        Returns offset in the deadline block and shape of variable, in the
+        given deadline or in the first one.
+        '''
+        fields = self.index['fields'] if deadline is None else \
+            self.__layout(deadline)['fields']
+        try:
+            return fields[variable]
+        except KeyError:
+            raise ValueError('variable {} does not exist.'.format(variable))
+
+    def __openStorage(self):
+        '''
+        Return the buffer holding the content of the ADSO/BIN file.
+        '''
+        with open(self.filename, 'rb') as f:
+            if self.storage == 'memory':
+                return f.read()
+            elif self.storage == 'mmap':
+                try:
+                    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # Empty files cannot be mapped
+                    return b''
+            elif self.storage == 'pread':
+                return preadfile(self.filename)
+            else:
+                raise ValueError('Unknown storage mode: {}'.format(
+                    self.storage))
+
+    def close(self):
+        '''
+        Release the file mapping.
+        Arrays returned as views of the file keep the mapping alive
+        until they are garbage collected.
+        '''
+        self.__closeStorage(self.__data)
+        self.__data = b''
+
+    def __closeStorage(self, data):
+        '''
+        Close the buffer holding the content of the file, if needed.
+        '''
+        if isinstance(data, mmap.mmap):
+            try:
+                data.close()
+            except BufferError:
+                # Views on the mapping are still alive
+                pass
+        elif isinstance(data, preadfile):
+            data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def getRecord1(self, deadline=1):
         '''
@@ -227,18 +1167,23 @@ class adsobin(object):
         -----DECLARATION OF THE "BINAIRA" TYPE
         Record 1 -> character*8
         '''
-        start = (deadline - 1) * self.size['blockSize'] + self.offset['rec1']
+        start = self.__deadlineOffset(deadline) + \
+            self.__layout(deadline)['offset']['rec1']
+        return self.__parseIdent(start)
+
+    def __parseIdent(self, start):
+        '''
+        Parse the character*8 record (1 or 2) at offset start.
+        '''
         start, binData = self.__readADSOChunk(start, self.__data)
-        _ident1 = struct.unpack('@8s', binData)[0].decode("utf-8")
-        # logger.debug('ident1 : {}'.format(_ident1))
-        return _ident1
+        return struct.unpack('@8s', binData)[0].decode("utf-8")
 
     def getVersion(self):
         '''
         Returns string with ADSO/BIN fileversion
         '''
-        # Read record 1 of first deadline
-        header = self.getRecord1(1)
+        # Record 1 of first deadline
+        header = self.index['rec1']
         if header == 'BBBBBBBB':
             version = '0'
         else:
@@ -251,11 +1196,9 @@ class adsobin(object):
         Record 2 -> character*8 code that generated the file
         '''
         # logger.debug('--- Read Record 2 ---')
-        start = (deadline - 1) * self.size['blockSize'] + self.offset['rec2']
-        start, binData = self.__readADSOChunk(start, self.__data)
-        _ident2 = struct.unpack('@8s', binData)[0].decode("utf-8")
-        # logger.debug('ident2 : {}'.format(_ident2))
-        return _ident2
+        start = self.__deadlineOffset(deadline) + \
+            self.__layout(deadline)['offset']['rec2']
+        return self.__parseIdent(start)
 
     def getRecord3(self, deadline=1, offset=None):
         '''
@@ -283,25 +1226,10 @@ class adsobin(object):
         if offset is not None:
             start = offset
         else:
-            start = (deadline - 1) * self.size['blockSize'] + \
-                self.offset['rec3']
+            start = self.__deadlineOffset(deadline) + \
+                self.__layout(deadline)['offset']['rec3']
         __nStart, __binData = self.__readADSOChunk(start, self.__data)
-        __num = struct.unpack('@27i', __binData)
-        __rec3 = {'ijozer': __num[0], 'imozer': __num[1], 'ianzer': __num[2],
-                  'ihezer': __num[3], 'imizer': __num[4], 'isezer': __num[5],
-                  'ijozei': __num[6], 'imozei': __num[7], 'ianzei': __num[8],
-                  'ihezei': __num[9], 'imizei': __num[10], 'isezei': __num[11],
-                  'immai': __num[12], 'jmmai': __num[13], 'kmmai': __num[14],
-                  'nreper': __num[15], 'nvar3d': __num[16],
-                  'nvar2d': __num[17], 'nevt': __num[18], 'itmax': __num[19],
-                  'nevtpr': __num[20], 'itmopro': __num[21],
-                  'IINDEX': __num[22], 'IKSURF': __num[23]}
-        if __rec3['ianzer'] < 1000:
-            __rec3['ianzer'] += 2000
-        if __rec3['ianzei'] < 1000:
-            __rec3['ianzei'] += 2000
-
-        return __rec3
+        return parseRecord3(__binData, self.byteorder)
 
     def getRecord4(self, deadline=1):
         '''
@@ -321,32 +1249,16 @@ class adsobin(object):
                          absolute heigh of domain top plane in meters
         '''
         # logger.debug('--- Read Record 4 ---')
-        start = (deadline - 1) * self.size['blockSize'] + self.offset['rec4']
-        start, binData = self.__readADSOChunk(start, self.__data)
+        layout = self.__layout(deadline)
+        start = self.__deadlineOffset(deadline) + layout['offset']['rec4']
+        return self.__parseRecord4(start, layout['rec3'])
 
-        rec3 = self.getRecord3(deadline)
-        nReals = 11 + rec3['kmmai']
-        typedef = '@' + str(nReals) + 'f'
-        fnum = struct.unpack(typedef, binData)
-        sgrid = fnum[0:rec3['kmmai']]
-        i = rec3['kmmai']
-        dxmai = fnum[i]
-        dymai = fnum[i+1]
-        xlso = fnum[i+2]
-        ylso = fnum[i+3]
-        xlatso = fnum[i+4]
-        ylatso = fnum[i+5]
-        ztop = fnum[i+10]
-
-        rec4 = {'sgrid': sgrid,
-                'dxmai': dxmai,
-                'dymai': dymai,
-                'xlso': xlso,
-                'ylso': ylso,
-                'xlatso': xlatso,
-                'ylatso': ylatso,
-                'ztop': ztop}
-        return rec4
+    def __parseRecord4(self, start, rec3):
+        '''
+        Parse record 4 at offset start, given record 3 of the deadline.
+        '''
+        start, binData = self.__readADSOChunk(start, self.__data)
+        return parseRecord4(binData, self.byteorder, rec3['kmmai'])
 
     def getRecord5(self, deadline=1):
         '''
@@ -365,50 +1277,27 @@ class adsobin(object):
                                unit of meas of 2D variables
         '''
         # logger.debug('--- Read Record 5 ---')
-        start = (deadline - 1) * self.size['blockSize'] + self.offset['rec5']
+        layout = self.__layout(deadline)
+        start = self.__deadlineOffset(deadline) + layout['offset']['rec5']
+        return self.__parseRecord5(start, layout['rec3'])
+
+    def __parseRecord5(self, start, rec3):
+        '''
+        Parse record 5 at offset start, given record 3 of the deadline.
+        '''
         start, binData = self.__readADSOChunk(start, self.__data)
+        return parseRecord5(binData, rec3)
 
-        rec3 = self.getRecord3(deadline)
-        # nStrings = rec3['nreper'] + 2 * rec3['nvar3d'] + 2 * rec3['nvar2d']
-        # typedef = '@' + str(nStrings * size['char8']) + 's'
-        # logger.debug('typedef: {}'.format(typedef))
-
-        # sStrings = struct.unpack(typedef, binData)
-
-        # creper = ''
-        # nomvar3D = ''
-        # univar3d = ''
-        # nomvar2d = ''
-        # univar2d = ''
-
-        # creper = [struct.unpack('@8s', binData[i:rec3['nreper']*8])[0]
-        #           for i in range(rec3['nreper'])]
-        offset = (rec3['nreper']) * 8
-        nomvar3d = [struct.unpack('@8s', binData[offset+i*8:offset +
-                    (i+1)*8])[0].decode('utf-8') for i in
-                    range(rec3['nvar3d'])]
-        offset = (rec3['nreper'] + rec3['nvar3d']) * 8
-        univar3d = [struct.unpack('@8s', binData[offset+i*8:offset +
-                    (i+1)*8])[0].decode('utf-8') for i in
-                    range(rec3['nvar3d'])]
-        offset = (rec3['nreper'] + 2*rec3['nvar3d']) * 8
-        nomvar2d = [struct.unpack('@8s', binData[offset+i*8:offset +
-                    (i+1)*8])[0].decode('utf-8') for i in
-                    range(rec3['nvar2d'])]
-        offset = (rec3['nreper'] + 2*rec3['nvar3d'] + rec3['nvar2d']) * 8
-        univar2d = [struct.unpack('@8s', binData[offset+i*8:offset +
-                    (i+1)*8])[0].decode('utf-8') for i in
-                    range(rec3['nvar2d'])]
-
-        # Strip whitespaces in nomva3d and nomvar2d
-        # nomvar3d = [name.strip() for name in nomvar3d]
-        # nomvar2d = [name.strip() for name in nomvar2d]
-        rec5 = {'nomvar3d': nomvar3d,
-                'univar3d': univar3d,
-                'nomvar2d': nomvar2d,
-                'univar2d': univar2d}
-        # logger.debug('rec5: {}'.format(rec5))
-        return rec5
+    def getHeader(self, deadline=1):
+        '''
+        Returns dictionary with records 1 to 5 of deadline, as expected by
+        adsowritebin.writeDeadline.
+        '''
+        return {'rec1': self.getRecord1(deadline),
+                'rec2': self.getRecord2(deadline),
+                'rec3': self.getRecord3(deadline),
+                'rec4': self.getRecord4(deadline),
+                'rec5': self.getRecord5(deadline)}
 
     def getRecord6(self, start):
         '''
@@ -419,230 +1308,949 @@ class adsobin(object):
         # logger.debug('--- Read Record 6 ---')
         pass
 
-    def getRecord7(self, deadline=1):
+    def getRecord7(self, deadline=1, copy=False, dtype=None):
         '''
         Read record 7 of deadline
         -----RECORD NUMBER 7 : 3D FIELDS----------------------------
                Record 5 to 5+NVAR3D-1
                        NVAR3D 3D arrays with variables on the 3D grid
                        orderd as indicated by NOMVAR3D names vector
+
+        Returns a dictionary of numpy arrays shaped as (x, y, z) for 3D
+        variables and (x, y) for 2D variables. See getDataset for the
+        meaning of copy and dtype.
         '''
         # logger.debug('--- Read Record 7 ---')
-        start = (deadline - 1) * self.size['blockSize'] + self.offset['rec7']
-        rec3 = self.getRecord3(deadline)
-        rec5 = self.getRecord5(deadline)
+        start = self.__deadlineOffset(deadline)
+        rec5 = self.__layout(deadline)['rec5']
         rec7 = {}
-        for i, name in enumerate(rec5['nomvar3d']):
-            # logger.debug('Read 3D variable # {}'.format(i))
-            start, binData = self.__readADSOChunk(start, self.__data)
-            nReals = rec3['immai'] * rec3['jmmai'] * rec3['kmmai']
-            typedef = '@' + str(nReals) + 'f'
-            # rec7['%s' % name.strip()] = list(struct.unpack(typedef, binData))
-            rec7[name] = list(struct.unpack(typedef, binData))
-
-        for i, name in enumerate(rec5['nomvar2d']):
-            # logger.debug('Read 2D variable # {}'.format(i))
-            start, binData = self.__readADSOChunk(start, self.__data)
-            nReals = rec3['immai'] * rec3['jmmai']
-            typedef = '@' + str(nReals) + 'f'
-            # rec7['%s' % name.strip()] = list(struct.unpack(typedef, binData))
-            rec7[name] = list(struct.unpack(typedef, binData))
+        for name in rec5['nomvar3d'] + rec5['nomvar2d']:
+            offset, shape = self.__field(name.strip(), deadline)
+            data = self.__readArray(start + offset, shape)
+            rec7[name] = self.__castArray(data, copy, dtype)
 
         return rec7
 
-    def getDataset(self, variable):
+    def getDataset(self, variable, time=None, x=None, y=None, z=None,
+                   copy=False, dtype=None):
         """
         Return all data (all dimensions) for the requested variable, as
         numpy array.
         The array can be either 4D (time, x, y, z) or 3D (time, x, y).
-        If the variable does not exist an empty numpy.array is returned.
+        If the variable does not exist a ValueError is raised.
+
+        A hyperslab of the dataset is returned if any of time, x, y, z
+        is given as a slice of 0-based indices. The time slice can also
+        be given with datetime bounds, start included and stop excluded:
+            getDataset('C1', time=slice(datetime(2020, 1, 1),
+                                        datetime(2020, 1, 8)),
+                       x=slice(10, 30), y=slice(10, 30), z=slice(0, 1))
+
+        By default the array is a read-only float32 view on the file
+        content, with the byte order of the file, and only the bytes of the
+        hyperslab are read from disk when it is accessed.
+        With copy=True an owned array in native byte order is returned,
+        while dtype (e.g. numpy.float64) returns an owned array of the
+        given type.
+        If the layout of the deadlines changes along the file, the variable
+        must have the same shape in all the selected deadlines and the
+        array is always a copy.
         """
+        ndeadlines = len(self)
+        time = self.__timeSlice(time)
+        selected = range(ndeadlines)[time]
+        if not self.index['uniform'] and len(selected) > 0:
+            offset, shape = self.__field(variable, selected[0] + 1)
+        else:
+            offset, shape = self.__field(variable)
+        window = [slice(None) if s is None else s for s in (x, y)]
+        if len(shape) == 3:
+            window.append(slice(None) if z is None else z)
+        elif z is not None:
+            raise ValueError('variable {} is 2D.'.format(variable))
+
+        if not self.index['uniform']:
+            parts = []
+            for nd in selected:
+                offset, dShape = self.__field(variable, nd + 1)
+                if dShape != shape:
+                    raise ValueError('variable {} changes shape along the '
+                                     'file.'.format(variable))
+                parts.append(self.__readArray(
+                    self.__deadlineOffset(nd + 1) + offset, shape,
+                    window=window))
+            if parts:
+                allData = np.stack(parts)
+            else:
+                allData = np.empty((0,) + shape, dtype=np.float32)[
+                    tuple([slice(None)] + window)]
+            return self.__castArray(allData, copy, dtype)
 
-        # Get list of 2D and 3D variable and dimensions
+        if len(selected) == 0:
+            allData = np.empty((0,) + shape, dtype=np.float32)[
+                tuple([slice(None)] + window)]
+        else:
+            # Deadlines are strided by the size of the deadline block
+            first = min(selected[0], selected[-1])
+            allData = self.__readArray(self.__deadlineOffset(first + 1) +
+                                       offset, shape, len(selected),
+                                       step=abs(selected.step),
+                                       window=window)
+            if selected.step < 0:
+                allData = allData[::-1]
+
+        return self.__castArray(allData, copy, dtype)
+
+    def iterDeadlines(self, variables=None, time=None, prefetch=0):
+        '''
+        Iterate over deadlines yielding (datetime, {variable: array}) with
+        fields shaped as in getRecord7.
+        variables is the list of variables to be read (all by default) and
+        time an optional slice of deadlines as in getDataset.
+        If the layout of the deadlines changes along the file, the variables
+        must be present in all the deadlines.
+
+        With prefetch=0 fields are read-only views on the file.
+        With prefetch=N a background thread reads the following N deadlines
+        in advance into a pool of N + 1 buffers which are reused along the
+        iteration: the arrays yielded are overwritten after the next
+        iteration and must be copied to be kept.
+        '''
+        if variables is None:
+            variables = list(self.index['fields'])
+        fields = [(name, ) + self.__field(name) for name in variables]
+        deadlines = self.getDeadlines()
+        ndeadlines = range(len(self))[self.__timeSlice(time)]
+
+        def readDeadline(nd, out=None):
+            start = self.__deadlineOffset(nd + 1)
+            data = {}
+            for name, offset, shape in fields:
+                if not self.index['uniform']:
+                    offset, shape = self.__field(name, nd + 1)
+                data[name] = self.__readArray(start + offset, shape)
+                if out is not None:
+                    np.copyto(out[name], data[name])
+                    data[name] = out[name]
+            return data
+
+        if prefetch < 1:
+            for nd in ndeadlines:
+                yield deadlines[nd], readDeadline(nd)
+            return
+
+        free = queue.Queue()
+        ready = queue.Queue()
+        stop = threading.Event()
+        for i in range(prefetch + 1):
+            free.put({name: np.empty(shape, dtype=np.float32, order='F')
+                      for name, offset, shape in fields})
+
+        def reader():
+            try:
+                for nd in ndeadlines:
+                    buffer = free.get()
+                    if stop.is_set():
+                        return
+                    ready.put((nd, readDeadline(nd, buffer)))
+            except Exception as e:
+                ready.put((None, e))
+                return
+            ready.put((None, None))
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
         try:
-            rec5 = self.getRecord5(deadline=1)
-            rec3 = self.getRecord3(deadline=1)
-
-            nx = rec3['immai']
-            ny = rec3['jmmai']
-            nz = rec3['kmmai']
-
-            nomvar3d = [name.strip() for name in rec5['nomvar3d']]
-            nomvar2d = [name.strip() for name in rec5['nomvar2d']]
-
-            # # List of deadlines
-            # deadlines = self.getDeadlines()
-            ndeadlines = len(self)
-        except Exception:
+            while True:
+                nd, data = ready.get()
+                if nd is None:
+                    if data is not None:
+                        raise data
+                    break
+                yield deadlines[nd], data
+                free.put(data)
+        finally:
+            # Release the reader if it is waiting for a free buffer
+            stop.set()
+            free.put(None)
+            thread.join()
+
+    def extract(self, filename, variables=None, time=None, x=None, y=None,
+                z=None):
+        '''
+        Write a subset of the file to a new ADSO/BIN file, deadline by
+        deadline, and return the number of deadlines written.
+        variables is the list of variables to be kept (all by default),
+        time a slice of deadlines as in getDataset and x, y, z slices of
+        0-based grid points (with positive step) of the sub-domain.
+        Records 3, 4 and 5 are rewritten for the reduced grid and list of
+        variables: xlso and ylso are moved to the first grid point kept,
+        dxmai and dymai are multiplied by the step and sgrid is reduced to
+        the levels kept. xlatso, ylatso and ztop are not changed and the
+        reference points of record 6 are dropped.
+        Fields are written directly from the file when the whole grid is
+        kept, so that at most one field is held in memory.
+        '''
+        self.__checkOutput(filename)
+        window = []
+        for axis, s in (('x', x), ('y', y), ('z', z)):
+            s = slice(None) if s is None else s
+            if s.step is not None and s.step < 1:
+                raise ValueError('{} must be a slice with positive '
+                                 'step.'.format(axis))
+            window.append(s)
+
+        ndeadlines = 0
+        writer = adsowritebin(filename, self.byteorder)
+        try:
+            with writer:
+                for nd in range(len(self))[self.__timeSlice(time)]:
+                    header = self.__extractHeader(nd + 1, variables, window)
+                    start = self.__deadlineOffset(nd + 1)
+                    fields = {}
+                    for name in header['rec5']['nomvar3d'] + \
+                            header['rec5']['nomvar2d']:
+                        offset, shape = self.__field(name.strip(), nd + 1)
+                        fields[name] = self.__readArray(
+                            start + offset, shape,
+                            window=window[:len(shape)])
+                    writer.writeDeadline(header, fields)
+                    ndeadlines += 1
+        except BaseException:
+            # Do not leave an incomplete file
+            os.remove(filename)
             raise
+        return ndeadlines
 
-        # Size of 2D & 3D block of data
-        b2Dsize = nx * ny * size['real'] + size['pad']
-        b3Dsize = nx * ny * nz * size['real'] + size['pad']
+    def __checkOutput(self, filename):
+        '''
+        Raise ValueError if filename is the file being read (also through
+        a link), which would be truncated by the writer.
+        '''
+        if os.path.exists(filename) and \
+                os.path.samefile(filename, self.filename):
+            raise ValueError('Cannot write {} over the file being read.'
+                             .format(filename))
 
-        # Is variable 2D or 3D?
-        is3D = False
-        try:
-            # Position of 3D variable (0-based) & offset
-            vc = nomvar3d.index(variable)
-            is3D = True
-            # data block size in each deadline
-            dataSize = int(nx * ny * nz * size['real'])
-            # Init the array
-            allData = np.empty([ndeadlines, nx, ny, nz])
-            dataShape = [nx, ny, nz]
-        except ValueError:
-            vc = nomvar2d.index(variable)
-            dataSize = int(nx * ny * size['real'])
-            allData = np.empty([ndeadlines, nx, ny])
-            dataShape = [nx, ny]
-
-        # Loop on deadlines
-        for deadline in range(len(self)):
-            # Get deadline offset
-            offset = deadline * self.size['blockSize'] + self.offset['rec7']
-
-            if is3D:
-                offset = offset + vc * b3Dsize + int(size['pad'] / 2)
-                nReals = nx * ny * nz
+    def __extractHeader(self, deadline, variables, window):
+        '''
+        Returns the header of a deadline reduced to the variables and to
+        the x, y, z window of extract.
+        '''
+        header = self.getHeader(deadline)
+        rec3 = header['rec3']
+        rec4 = header['rec4']
+        rec5 = header['rec5']
+        xr = range(rec3['immai'])[window[0]]
+        yr = range(rec3['jmmai'])[window[1]]
+        zr = range(rec3['kmmai'])[window[2]]
+        if len(xr) == 0 or len(yr) == 0 or len(zr) == 0:
+            raise ValueError('Empty sub-domain.')
+
+        names = [name.strip() for name in rec5['nomvar3d'] +
+                 rec5['nomvar2d']]
+        for variable in variables or []:
+            if variable not in names:
+                raise ValueError('variable {} does not exist.'.format(
+                    variable))
+        kept = {}
+        for var in ('3d', '2d'):
+            kept[var] = [n for n, name in enumerate(rec5['nomvar' + var])
+                         if variables is None or name.strip() in variables]
+
+        header['rec3'] = dict(rec3, immai=len(xr), jmmai=len(yr),
+                              kmmai=len(zr), nreper=0,
+                              nvar3d=len(kept['3d']), nvar2d=len(kept['2d']))
+        header['rec4'] = dict(rec4, sgrid=tuple(rec4['sgrid'][k] for k in zr),
+                              dxmai=rec4['dxmai'] * xr.step,
+                              dymai=rec4['dymai'] * yr.step,
+                              xlso=rec4['xlso'] + xr.start * rec4['dxmai'],
+                              ylso=rec4['ylso'] + yr.start * rec4['dymai'])
+        header['rec5'] = {key + var: [rec5[key + var][n] for n in kept[var]]
+                          for key in ('nomvar', 'univar')
+                          for var in ('3d', '2d')}
+        return header
+
+    def getPointSeries(self, variable, points, level=1,
+                       interpolation='nearest', time=None):
+        '''
+        Return the time series of variable at a list of points, as numpy
+        array shaped as (time, points).
+        points is a sequence of (x, y) metric coordinates, in the same
+        units of xlso, ylso, dxmai and dymai of record 4: grid point (i, j)
+        is at (xlso + i * dxmai, ylso + j * dymai).
+        level is the 1-based level of 3D variables, interpolation is either
+        'nearest' or 'bilinear' and time an optional slice of deadlines as
+        in getDataset.
+        Only the bounding box of the cells needed by the points is read in
+        each deadline, and the cells of all the points are gathered at once.
+        '''
+        if interpolation not in ('nearest', 'bilinear'):
+            raise ValueError('Unknown interpolation: {}'.format(
+                interpolation))
+        offset, shape = self.__field(variable)
+        nx, ny = shape[:2]
+        z = None
+        if len(shape) == 3:
+            if level < 1 or level > shape[2]:
+                raise ValueError('level {} out of range [1, {}].'.format(
+                    level, shape[2]))
+            z = slice(level - 1, level)
+        rec4 = self.index['rec4']
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        fx = (points[:, 0] - rec4['xlso']) / rec4['dxmai']
+        fy = (points[:, 1] - rec4['ylso']) / rec4['dymai']
+        # Tolerance for points on the domain boundary
+        eps = 1e-6
+        if np.any((fx < -eps) | (fx > nx - 1 + eps) |
+                  (fy < -eps) | (fy > ny - 1 + eps)):
+            raise ValueError('Points outside of the domain.')
+
+        if interpolation == 'nearest':
+            ix = np.clip(np.rint(fx).astype(np.intp), 0, nx - 1)
+            iy = np.clip(np.rint(fy).astype(np.intp), 0, ny - 1)
+            ix1, iy1 = ix, iy
+        else:
+            ix = np.clip(np.floor(fx).astype(np.intp), 0, max(nx - 2, 0))
+            iy = np.clip(np.floor(fy).astype(np.intp), 0, max(ny - 2, 0))
+            wx = np.clip(fx - ix, 0, 1)
+            wy = np.clip(fy - iy, 0, 1)
+            ix1 = np.minimum(ix + 1, nx - 1)
+            iy1 = np.minimum(iy + 1, ny - 1)
+
+        # Only the bounding box of the cells needed is read, in chunks of
+        # deadlines bounding the memory of pread storage
+        selected = range(len(self))[self.__timeSlice(time)]
+        if len(points) == 0 or len(selected) == 0:
+            return np.empty((len(selected), len(points)))
+        x = slice(int(ix.min()), int(ix1.max()) + 1)
+        y = slice(int(iy.min()), int(iy1.max()) + 1)
+        ix, ix1 = ix - x.start, ix1 - x.start
+        iy, iy1 = iy - y.start, iy1 - y.start
+        nChunk = max(1, 2 ** 22 // ((x.stop - x.start) * (y.stop - y.start)))
+        series = []
+        for n in range(0, len(selected), nChunk):
+            chunk = selected[n:n + nChunk]
+            stop = chunk.stop if chunk.stop >= 0 else None
+            data = self.getDataset(variable, slice(chunk.start, stop,
+                                                   chunk.step), x, y, z)
+            if data.ndim == 4:
+                data = data[..., 0]
+            # Cells of all the points are gathered at once
+            if interpolation == 'nearest':
+                series.append(data[:, ix, iy].astype(np.float64))
             else:
-                offset = offset + len(rec5['nomvar3d']) * \
-                    b3Dsize + vc * b2Dsize + int(size['pad'] / 2)
-                nReals = nx * ny
-
-            try:
-                # Subset data and extract slice
-                offset = int(offset)
-                binData = self.__data[offset:offset+dataSize]
-                typedef = '@' + str(nReals) + 'f'
-                dData = list(struct.unpack(typedef, binData))
-
-                # Fill the numpy array
-                dData = np.array(dData)
-                dData = dData.reshape(dataShape, order='F')
-                allData[deadline:] = dData
-            except Exception:
-                raise
-
-        return allData
-
-    def getSlice(self, variable, slice=1, deadline=1):
+                series.append(data[:, ix, iy] * ((1 - wx) * (1 - wy)) +
+                              data[:, ix1, iy] * (wx * (1 - wy)) +
+                              data[:, ix, iy1] * ((1 - wx) * wy) +
+                              data[:, ix1, iy1] * (wx * wy))
+        return np.concatenate(series)
+
+    def getStatistics(self, variables, statistics=('mean', 'std', 'min',
+                                                   'max'),
+                      percentiles=(), level=None, time=None, prefetch=1,
+                      maxKept=100):
         '''
-        Read a slice of data from a given deadline of a given variable.
+        Compute per-cell statistics of one or more variables over all
+        deadlines (or over a time slice as in getDataset), reading the
+        file once.
+        statistics is a subset of 'mean', 'std', 'min', 'max', 'count';
+        percentiles is a list of percentiles in [0, 100] (e.g. [99.8]).
+        level is the 1-based level of 3D variables (all levels by default).
+
+        Returns a dictionary {variable: {statistic: array}} with arrays
+        shaped as the fields. Percentiles are stored as 'p<percentile>'
+        (e.g. 'p99.8').
+        Mean and standard deviation (population) are accumulated with the
+        Welford algorithm. Tail percentiles are computed exactly as
+        numpy.percentile does, keeping in memory only the highest (or
+        lowest, for percentiles below 50) values of each cell needed to get
+        the result, i.e. about (100 - percentile) % of the deadlines: e.g.
+        18 values for the 99.8 percentile of a year of hourly deadlines.
+        Percentiles needing more than maxKept values of each cell (such as
+        the median) are estimated with the P-square algorithm instead, in
+        constant memory (see p2percentile).
         '''
-
-        #   Go to deadline offset
-        offset = (deadline - 1) * self.size['blockSize'] + self.offset['rec7']
+        if isinstance(variables, str):
+            variables = [variables]
+        for statistic in statistics:
+            if statistic not in ('mean', 'std', 'min', 'max', 'count'):
+                raise ValueError('Unknown statistic: {}'.format(statistic))
+        ndeadlines = len(range(len(self))[self.__timeSlice(time)])
+        if ndeadlines == 0:
+            raise ValueError('No deadlines selected.')
+
+        # Ranks of the sorted values needed by each percentile
+        ranks = {}
+        for percentile in percentiles:
+            if percentile < 0 or percentile > 100:
+                raise ValueError('Percentile {} out of range.'.format(
+                    percentile))
+            position = percentile / 100 * (ndeadlines - 1)
+            low = int(np.floor(position))
+            high = min(low + 1, ndeadlines - 1)
+            if (ndeadlines - low if percentile >= 50 else high + 1) <= \
+                    maxKept:
+                ranks[percentile] = (low, high, position - low)
+        estimated = [percentile for percentile in percentiles
+                     if percentile not in ranks]
+        # Number of highest (lowest) values kept in memory for each cell
+        nHigh = max([ndeadlines - low for p, (low, high, frac) in
+                     ranks.items() if p >= 50] + [0])
+        nLow = max([high + 1 for p, (low, high, frac) in
+                    ranks.items() if p < 50] + [0])
+
+        accumulators = {}
+        n = 0
+        for dtdeadline, fields in self.iterDeadlines(variables, time,
+                                                     prefetch):
+            n += 1
+            for name, field in fields.items():
+                if level is not None and field.ndim == 3:
+                    field = field[:, :, level - 1]
+                acc = accumulators.get(name)
+                if acc is None:
+                    acc = {'mean': np.zeros(field.shape),
+                           'm2': np.zeros(field.shape),
+                           'min': np.array(field, dtype=np.float32),
+                           'max': np.array(field, dtype=np.float32),
+                           'high': np.full((nHigh, field.size), -np.inf,
+                                           dtype=np.float32),
+                           'low': np.full((nLow, field.size), np.inf,
+                                          dtype=np.float32),
+                           'p2': [p2percentile(percentile, field.shape)
+                                  for percentile in estimated]}
+                    accumulators[name] = acc
+                # Welford
+                delta = field - acc['mean']
+                acc['mean'] += delta / n
+                acc['m2'] += delta * (field - acc['mean'])
+                np.minimum(acc['min'], field, out=acc['min'])
+                np.maximum(acc['max'], field, out=acc['max'])
+                # Insert the values in the sorted highest (lowest) values
+                # of the cells where they are among them
+                values = np.asarray(field, dtype=np.float32).reshape(
+                    -1, order='F')
+                for kept, sign in ((acc['high'], -1), (acc['low'], 1)):
+                    if len(kept) == 0:
+                        continue
+                    cells = np.flatnonzero(sign * values < sign * kept[-1])
+                    if len(cells) == 0:
+                        continue
+                    merged = np.vstack([kept[:, cells], values[cells]])
+                    kept[:, cells] = sign * np.sort(sign * merged,
+                                                    axis=0)[:-1]
+                for estimator in acc['p2']:
+                    estimator.add(field)
+
+        results = {}
+        for name, acc in accumulators.items():
+            result = {}
+            for statistic in statistics:
+                if statistic == 'mean':
+                    result['mean'] = acc['mean']
+                elif statistic == 'std':
+                    result['std'] = np.sqrt(acc['m2'] / n)
+                elif statistic == 'count':
+                    result['count'] = np.full(acc['mean'].shape, n)
+                else:
+                    result[statistic] = acc[statistic]
+            for percentile, (low, high, frac) in ranks.items():
+                if percentile >= 50:
+                    # high[0] is the highest value, i.e. rank n - 1
+                    lowValue = acc['high'][n - 1 - low]
+                    highValue = acc['high'][n - 1 - high]
+                else:
+                    lowValue = acc['low'][low]
+                    highValue = acc['low'][high]
+                value = lowValue + frac * (highValue.astype(np.float64) -
+                                           lowValue)
+                result['p{:g}'.format(percentile)] = value.reshape(
+                    acc['mean'].shape, order='F')
+            for estimator in acc['p2']:
+                result['p{:g}'.format(estimator.percentile)] = \
+                    estimator.result()
+            results[name] = result
+        return results
+
+    def aggregate(self, variables, period='day', statistic='mean',
+                  window=None, level=None, time=None, closed='right',
+                  prefetch=1):
+        '''
+        Aggregate one or more variables along time, reading the file once
+        and yielding (datetime, {variable: array}) for each aggregated
+        deadline, with float64 arrays shaped as the fields.
+        If window is given (hours or timedelta) the running mean over the
+        deadlines of the last window hours is computed first, labelled by
+        the last deadline of the window: only the window is kept in memory,
+        in a ring buffer. The window must be a multiple of the time step of
+        the file and restarts after a gap in the deadlines.
+        If period is 'day' or 'month' the deadlines (or the running means)
+        are grouped by calendar period and reduced with statistic ('mean',
+        'max', 'min' or 'sum'), labelled by the start of the period. With
+        closed='right' a deadline at midnight closes the previous day, as
+        deadlines mark the end of the time interval they refer to; with
+        closed='left' it opens the following day. Incomplete periods at the
+        ends of the series are included.
+        level is the 1-based level of 3D variables (all levels by default)
+        and time an optional slice of deadlines as in getDataset.
+        E.g. the daily maximum of the 8-hour running mean:
+            aggregate('O3', period='day', statistic='max', window=8)
+        '''
+        if isinstance(variables, str):
+            variables = [variables]
+        if period not in (None, 'day', 'month'):
+            raise ValueError('Unknown period: {}'.format(period))
+        if statistic not in ('mean', 'max', 'min', 'sum'):
+            raise ValueError('Unknown statistic: {}'.format(statistic))
+        if closed not in ('right', 'left'):
+            raise ValueError('closed must be either right or left.')
+        if period is None and window is None:
+            raise ValueError('Either period or window must be given.')
+
+        series = self.iterDeadlines(variables, time, prefetch)
+        if level is not None:
+            series = ((dtdeadline, {name: field[:, :, level - 1]
+                                    if field.ndim == 3 else field
+                                    for name, field in fields.items()})
+                      for dtdeadline, fields in series)
+        if window is not None:
+            if not isinstance(window, timedelta):
+                window = timedelta(hours=window)
+            series = self.__runningMean(series, window, time)
+        if period is not None:
+            series = self.__groupPeriod(series, period, statistic, closed)
+        return series
+
+    def __runningMean(self, series, window, time):
+        '''
+        Yield the running mean over window of a series of
+        (datetime, fields) with the time step of the file.
+        '''
+        dtdeadlines = self.getDeadlineArray()[self.__timeSlice(time)]
+        if len(dtdeadlines) < 2:
+            return
+        step = (dtdeadlines[1] - dtdeadlines[0]).tolist()
+        nWindow = window // step
+        if nWindow < 1 or nWindow * step != window:
+            raise ValueError('Window {} is not a multiple of the time step '
+                             '{}.'.format(window, step))
+
+        ring = {}
+        sums = {}
+        count = 0
+        last = None
+        for nd, (dtdeadline, fields) in enumerate(series):
+            if last is not None and dtdeadline - last != step:
+                # Restart after a gap
+                count = 0
+            last = dtdeadline
+            slot = nd % nWindow
+            for name, field in fields.items():
+                if name not in ring:
+                    ring[name] = np.zeros((nWindow,) + field.shape,
+                                          dtype=np.float64)
+                    sums[name] = np.zeros(field.shape, dtype=np.float64)
+                if count == 0:
+                    sums[name].fill(0)
+                elif count >= nWindow:
+                    # Drop the oldest field of the window
+                    sums[name] -= ring[name][slot]
+                np.copyto(ring[name][slot], field)
+                sums[name] += ring[name][slot]
+            count += 1
+            if count >= nWindow:
+                yield dtdeadline, {name: value / nWindow
+                                   for name, value in sums.items()}
+
+    def __groupPeriod(self, series, period, statistic, closed):
+        '''
+        Yield the reduction with statistic of a series of
+        (datetime, fields) grouped by calendar period.
+        '''
+        def periodStart(dtdeadline):
+            if closed == 'right':
+                dtdeadline -= timedelta(microseconds=1)
+            dtdeadline = dtdeadline.replace(hour=0, minute=0, second=0,
+                                            microsecond=0)
+            if period == 'month':
+                dtdeadline = dtdeadline.replace(day=1)
+            return dtdeadline
+
+        def result(acc, count):
+            if statistic == 'mean':
+                return {name: value / count for name, value in acc.items()}
+            return acc
+
+        current = None
+        acc = {}
+        count = 0
+        for dtdeadline, fields in series:
+            start = periodStart(dtdeadline)
+            if current is not None and start != current:
+                yield current, result(acc, count)
+                acc = {}
+                count = 0
+            current = start
+            count += 1
+            for name, field in fields.items():
+                if name not in acc:
+                    acc[name] = np.array(field, dtype=np.float64)
+                elif statistic in ('mean', 'sum'):
+                    acc[name] += field
+                elif statistic == 'max':
+                    np.maximum(acc[name], field, out=acc[name])
+                else:
+                    np.minimum(acc[name], field, out=acc[name])
+        if current is not None:
+            yield current, result(acc, count)
+
+    def writeAggregate(self, filename, variables, period='day',
+                       statistic='mean', window=None, level=None, time=None,
+                       closed='right', prefetch=1):
+        '''
+        Write the aggregated series of aggregate (with the same arguments)
+        to a new ADSO/BIN file, and return the number of deadlines written.
+        Each aggregated deadline is written with its label as datetime,
+        the selected variables and, if level is given, the selected level
+        only.
+        '''
+        self.__checkOutput(filename)
+        if isinstance(variables, str):
+            variables = [variables]
+        selected = range(len(self))[self.__timeSlice(time)]
+        if len(selected) == 0:
+            raise ValueError('No deadlines selected.')
+        window3d = [slice(None), slice(None),
+                    slice(None) if level is None else slice(level - 1, level)]
+        template = self.__extractHeader(selected[0] + 1, variables, window3d)
+
+        ndeadlines = 0
+        writer = adsowritebin(filename, self.byteorder)
         try:
-            rec5 = self.getRecord5(deadline)
-            rec3 = self.getRecord3(deadline)
-        except Exception:
+            with writer:
+                for dtdeadline, fields in self.aggregate(
+                        variables, period, statistic, window, level, time,
+                        closed, prefetch):
+                    header = dict(template)
+                    header['rec3'] = dict(
+                        template['rec3'], ijozer=dtdeadline.day,
+                        imozer=dtdeadline.month, ianzer=dtdeadline.year,
+                        ihezer=dtdeadline.hour, imizer=dtdeadline.minute,
+                        isezer=dtdeadline.second)
+                    writer.writeDeadline(header, fields)
+                    ndeadlines += 1
+        except BaseException:
+            # Do not leave an incomplete file
+            os.remove(filename)
             raise
+        return ndeadlines
 
-        nomvar3d = [name.strip() for name in rec5['nomvar3d']]
-        nomvar2d = [name.strip() for name in rec5['nomvar2d']]
-
-        # Check if required variable is in the list of available ones
-
-        # Size of 3D block of data
-        b3Dsize = rec3['immai'] * rec3['jmmai'] * \
-            rec3['kmmai'] * size['real'] + size['pad']
-
-        # Size of 2D block of data
-        b2Dsize = rec3['immai'] * rec3['jmmai'] * size['real'] + size['pad']
-
-        # Size of 2D slice
-        b2Dslice = int(rec3['immai'] * rec3['jmmai'] * size['real'])
-
-        try:
-            # Position of 3D variable (0-based)
-            vc = nomvar3d.index(variable)
+    def getExceedances(self, variables, thresholds, period=None,
+                       statistic='mean', window=None, level=None, time=None,
+                       closed='right', prefetch=0):
+        '''
+        Count in each grid cell the deadlines in which one or more
+        variables are above each of a list of thresholds, reading the file
+        once. Returns {variable: array} with int32 arrays shaped as
+        (thresholds,) + field shape.
+        Without period and window fields are compared on views on the file,
+        and the counts are of deadlines (e.g. hours). Otherwise the values
+        compared are the aggregated ones of aggregate, with the same
+        arguments: e.g. period='day' counts the days with daily mean above
+        the thresholds, and period='day', statistic='max', window=8 the
+        days with maximum 8-hour running mean above them.
+        level is the 1-based level of 3D variables (all levels by default)
+        and time an optional slice of deadlines as in getDataset.
+        '''
+        if isinstance(variables, str):
+            variables = [variables]
+        thresholds = np.asarray(thresholds, dtype=np.float64).ravel()
 
-            # 3D variable offset
-            offset = offset + vc * b3Dsize
+        if period is None and window is None:
+            series = self.iterDeadlines(variables, time, prefetch)
+        else:
+            series = self.aggregate(variables, period, statistic, window,
+                                    level, time, closed, prefetch)
+            level = None
+
+        counts = {}
+        masks = {}
+        for dtdeadline, fields in series:
+            for name, field in fields.items():
+                if level is not None and field.ndim == 3:
+                    field = field[:, :, level - 1]
+                if name not in counts:
+                    shape = (len(thresholds),) + field.shape
+                    counts[name] = np.zeros(shape, dtype=np.int32)
+                    masks[name] = np.empty(shape, dtype=bool)
+                # Thresholds broadcast along the field dimensions
+                limits = thresholds.reshape((-1,) + (1,) * field.ndim)
+                np.greater(field, limits, out=masks[name])
+                counts[name] += masks[name]
+        return counts
+
+    def __timeSlice(self, time):
+        '''
+        Convert a slice of deadline indices or datetimes to a slice of
+        deadline indices.
+        '''
+        return deadlineSlice(time, self.getDeadlineArray)
 
+    def getSlice(self, variable, slice=1, deadline=1, copy=False,
+                 dtype=None):
+        '''
+        Read a slice of data from a given deadline of a given variable.
+        Returns a numpy array shaped as (x, y). See getDataset for the
+        meaning of copy and dtype.
+        '''
+        offset, shape = self.__field(variable, deadline)
+        offset += self.__deadlineOffset(deadline)
+        if len(shape) == 3:
+            if slice < 1 or slice > shape[2]:
+                raise ValueError('slice {} out of range [1, {}].'.format(
+                    slice, shape[2]))
             # slice offset
-            offset = offset + int(size['pad'] / 2) + \
-                (slice - 1) * b2Dslice
-        except ValueError:
-            pass
-
-        try:
-            # Position of 2D variable (0 based)
-            vc = nomvar2d.index(variable)
-
-            # 2D variable offset
-            offset = offset + len(rec5['nomvar3d']) * \
-                b3Dsize + vc * b2Dsize + int(size['pad'] / 2)
-        except ValueError:
-            pass
+            offset += (slice - 1) * shape[0] * shape[1] * size['real']
 
-        try:
-            # Subset data and extract slice
-            offset = int(offset)
-            binData = self.__data[offset:offset+b2Dslice]
-            nReals = rec3['immai'] * rec3['jmmai']
-            typedef = '@' + str(nReals) + 'f'
-            slice = list(struct.unpack(typedef, binData))
-        except UnboundLocalError:
-            print('variable {} does not exist.'.format(variable))
-        except Exception:
-            raise
+        data = self.__readArray(offset, shape[:2])
+        return self.__castArray(data, copy, dtype)
 
-        slice = np.array(slice)
-        return slice
+    def getHeightSlices(self, variable, heights, deadline=1, orography=None,
+                        fill=None):
+        '''
+        Interpolate a 3D variable of a given deadline to heights above
+        ground in meters. Returns a float32 numpy array shaped as
+        (x, y, heights), or as (x, y) for a single height.
+        Levels are terrain following: level k of a cell with ground
+        elevation zs is at sgrid[k] * (ztop - zs) / ztop above ground, with
+        sgrid and ztop of record 4. orography is the name of a 2D variable
+        of the file with zs, read from the first deadline: without it the
+        levels are at sgrid in all the cells.
+        Values are linearly interpolated between the levels enclosing each
+        height. Heights below the first level or above the last one take
+        the value of the nearest level, or fill if given.
+        Interpolation weights are computed once for each set of heights and
+        cached, so that each call only reads the field and interpolates
+        all the cells and heights at once.
+        '''
+        offset, shape = self.__field(variable, deadline)
+        if len(shape) != 3:
+            raise ValueError('variable {} is not 3D.'.format(variable))
+        single = np.ndim(heights) == 0
+        heights = np.asarray(heights, dtype=np.float64).ravel()
+        lower, upper, weight, outside = self.__getHeightWeights(
+            heights, self.__layout(deadline)['rec4'], orography)
+
+        data = self.__readArray(offset + self.__deadlineOffset(deadline),
+                                shape)
+        result = np.take_along_axis(data, lower, axis=2) * (1 - weight)
+        result += np.take_along_axis(data, upper, axis=2) * weight
+        if fill is not None:
+            result[np.broadcast_to(outside, result.shape)] = fill
+        return result[:, :, 0] if single else result
+
+    def __getHeightWeights(self, heights, rec4, orography=None):
+        '''
+        Returns the interpolation weights of getHeightSlices: indices of the
+        lower and upper levels, weight of the upper level and mask of the
+        heights outside the levels, shaped as (x, y, heights) or, without
+        orography, as (1, 1, heights).
+        '''
+        key = (heights.tobytes(), tuple(rec4['sgrid']), rec4['ztop'],
+               orography)
+        if key in self.__heightWeights:
+            return self.__heightWeights[key]
+
+        sgrid = np.asarray(rec4['sgrid'], dtype=np.float64)
+        if (np.diff(sgrid) <= 0).any():
+            raise ValueError('sgrid levels are not increasing.')
+        if orography is None:
+            scale = np.ones((1, 1))
+        else:
+            zs = self.getSlice(orography, dtype=np.float64)
+            scale = (rec4['ztop'] - zs) / rec4['ztop']
+        # Heights in sgrid coordinates: cells with the ground at the top of
+        # the domain are above all the levels
+        with np.errstate(divide='ignore'):
+            sheights = np.where(scale[:, :, np.newaxis] > 0,
+                                heights / scale[:, :, np.newaxis], np.inf)
+
+        lower = np.searchsorted(sgrid, sheights, side='right') - 1
+        lower = np.clip(lower, 0, max(len(sgrid) - 2, 0))
+        upper = np.minimum(lower + 1, len(sgrid) - 1)
+        thickness = sgrid[upper] - sgrid[lower]
+        with np.errstate(invalid='ignore'):
+            weight = np.divide(sheights - sgrid[lower], thickness,
+                               out=np.zeros_like(sheights),
+                               where=thickness > 0)
+        weight = np.clip(weight, 0, 1).astype(np.float32)
+        outside = (sheights < sgrid[0]) | (sheights > sgrid[-1])
+        weights = (lower, upper, weight, outside)
+        self.__heightWeights[key] = weights
+        return weights
+
+    def readMany(self, requests, copy=False, dtype=None):
+        '''
+        Read many fields at once. requests is a sequence of
+        (variable, deadline, level) with 1-based deadline and level: level
+        selects a slice of a 3D variable as in getSlice, while with
+        level=None the whole field is read, shaped as in getRecord7.
+        Returns the list of arrays in the order of the requests. See
+        getDataset for the meaning of copy and dtype.
+        Requests whose bytes are adjacent in the file (e.g. consecutive
+        levels or consecutive variables of a deadline) are coalesced into
+        a single read.
+        '''
+        spans = []
+        for variable, deadline, level in requests:
+            offset, shape = self.__field(variable, deadline)
+            offset += self.__deadlineOffset(deadline)
+            if len(shape) == 3 and level is not None:
+                if level < 1 or level > shape[2]:
+                    raise ValueError('level {} out of range [1, {}].'.format(
+                        level, shape[2]))
+                offset += (level - 1) * shape[0] * shape[1] * size['real']
+                shape = shape[:2]
+            spans.append((offset, shape,
+                          int(np.prod(shape)) * size['real']))
+
+        fields = [None] * len(spans)
+        order = sorted(range(len(spans)), key=lambda n: spans[n][0])
+        while order:
+            # Group the requests separated at most by the record markers
+            group = [order.pop(0)]
+            start = spans[group[0]][0]
+            end = start + spans[group[0]][2]
+            while order and spans[order[0]][0] <= end + size['pad']:
+                group.append(order.pop(0))
+                end = max(end, spans[group[-1]][0] + spans[group[-1]][2])
+            data = self.__readArray(start, [end - start], dtype=np.uint8)
+            for n in group:
+                offset, shape, nBytes = spans[n]
+                field = data[offset - start:offset - start + nBytes].view(
+                    np.dtype(np.float32).newbyteorder(self.byteorder))
+                fields[n] = self.__castArray(
+                    field.reshape(shape, order='F'), copy, dtype)
+        return fields
+
+    def __readArray(self, offset, shape, ndeadlines=None, dtype=np.float32,
+                    step=1, window=None):
+        '''
+        Return a read-only view on a field stored at offset, shaped
+        in Fortran order, with the byte order of the file.
+        If ndeadlines is given, the same field is read from ndeadlines
+        deadlines, every step deadlines, and a time dimension is
+        prepended.
+        window is an optional sequence of slices of the field dimensions
+        selecting a hyperslab of the field.
+        With pread storage the field (only the bounding box of window) is
+        read into a new array.
+        '''
+        dtype = np.dtype(dtype).newbyteorder(self.byteorder)
+        itemsize = dtype.itemsize
+        stride = step * self.size['blockSize']
+        window = [slice(None)] * len(shape) if window is None else \
+            list(window)
+        if self.storage == 'pread':
+            data, shape, window = self.__readBox(offset, shape, window,
+                                                 ndeadlines or 1, stride,
+                                                 dtype)
+            stride = int(np.prod(shape)) * itemsize
+        strides = [itemsize]
+        for n in shape[:-1]:
+            strides.append(strides[-1] * n)
+        nItems = int(np.prod(shape))
+        if ndeadlines is not None:
+            shape = [ndeadlines] + list(shape)
+            strides = [stride] + strides
+            nItems += (ndeadlines - 1) * stride // itemsize
+            window = [slice(None)] + window
+        if self.storage != 'pread':
+            # np.frombuffer holds a reference to the buffer, so the mapping
+            # cannot be closed while the view is alive
+            data = np.frombuffer(self.__data, dtype=dtype, count=nItems,
+                                 offset=int(offset))
+        data = np.lib.stride_tricks.as_strided(data, shape=shape,
+                                               strides=strides,
+                                               writeable=False)
+        # Slicing a view does not read any data
+        return data[tuple(window)]
+
+    def __readBox(self, offset, shape, window, ndeadlines, stride, dtype):
+        '''
+        Read into a new array the bounding box of a window (slices) of the
+        field stored at offset, in ndeadlines deadlines stride bytes apart.
+        Returns the flat array, the shape of the box and the window
+        relative to the box. Each contiguous run of the box (a whole field
+        if the window covers it) is read at once.
+        '''
+        box = []
+        relative = []
+        for n, s in zip(shape, window):
+            r = range(n)[s]
+            if len(r) == 0:
+                box.append((0, 0))
+                relative.append(slice(0, 0))
+                continue
+            start = min(r[0], r[-1])
+            box.append((start, max(r[0], r[-1]) + 1))
+            stop = r[-1] - start + (1 if r.step > 0 else -1)
+            relative.append(slice(r[0] - start, stop if stop >= 0 else None,
+                                  r.step))
+        boxShape = [stop - start for start, stop in box]
+        data = np.empty(ndeadlines * int(np.prod(boxShape)), dtype=dtype)
+        if len(data) == 0:
+            return data, boxShape, relative
+
+        fileStrides = [dtype.itemsize]
+        for n in shape[:-1]:
+            fileStrides.append(fileStrides[-1] * n)
+        # Leading dimensions covered by the box are read in the same run
+        j = 0
+        while j < len(shape) - 1 and boxShape[j] == shape[j]:
+            j += 1
+        run = int(np.prod(boxShape[:j + 1]))
+        outer = list(range(len(shape) - 1, j, -1))
+        pos = 0
+        for nd in range(ndeadlines):
+            start = int(offset) + nd * stride + box[j][0] * fileStrides[j]
+            # Runs in Fortran order of the box
+            for index in np.ndindex(*[boxShape[k] for k in outer]):
+                runStart = start + sum((box[k][0] + i) * fileStrides[k]
+                                       for k, i in zip(outer, index))
+                self.__data.readinto(data[pos:pos + run], runStart)
+                pos += run
+        return data, boxShape, relative
+
+    def __castArray(self, data, copy=False, dtype=None):
+        '''
+        Return data as is, as a copy or converted to dtype.
+        Copies are always in native byte order.
+        '''
+        if dtype is not None:
+            return data.astype(dtype, copy=copy)
+        elif copy:
+            return data.astype(data.dtype.newbyteorder('='))
+        return data
 
     def __len__(self):
         '''
         Get number of deadlines.
         '''
-        remDeadlines = len(self.__data) % self.size['blockSize']
-        if remDeadlines != 0:
-            # logger.debug('len(self.__data): {}'.format(len(self.__data)))
-            # logger.debug('nBytesDeadline  : {}'.format(
-            #     self.size['blockSize']))
-            raise Exception('ADSOpy error.')
-        nDeadlines = int(len(self.__data) / self.size['blockSize'])
-        return nDeadlines
+        return len(self.index['deadlines'])
 
-    def getDeadlineBlockSize(self):
+    def getDeadlineBlockSize(self, rec3=None):
         '''
         Returns dictionary with the size of each record in bytes
-        and the size of the whole deadline in bytes.
-        '''
-        # Read record 3 of 1st deadline
-        rec3 = self.getRecord3(offset=32)
-
-        # Compute size of each block
-        nRec1 = size['char8'] + size['pad']
-        nRec2 = size['char8'] + size['pad']
-        nRec3 = 27 * size['int'] + size['pad']
-        nRec4 = (11 + rec3['kmmai']) * size['real'] + size['pad']
-        nRec5 = (rec3['nreper'] * size['char8'] +
-                 rec3['nvar3d'] * size['char8'] +
-                 rec3['nvar3d'] * size['char8'] +
-                 rec3['nvar2d'] * size['char8'] +
-                 rec3['nvar2d'] * size['char8']) + size['pad']
-        if rec3['nreper'] != 0:
-            nRec6 = 3 * rec3['nreper'] * size['real'] + size['pad']
-        else:
-            nRec6 = 0
-        nRec7 = (rec3['nvar3d'] * (size['pad'] + rec3['immai'] *
-                 rec3['jmmai'] * rec3['kmmai'] * size['real']) +
-                 rec3['nvar2d'] * (size['pad'] + rec3['immai'] *
-                 rec3['jmmai'] * size['real']))
-
-        nBytesDeadline = (nRec1 + nRec2 + nRec3 + nRec4 + nRec5 + nRec6 +
-                          nRec7)
-        deadlineBlock = {'rec1': nRec1,
-                         'rec2': nRec2,
-                         'rec3': nRec3,
-                         'rec4': nRec4,
-                         'rec5': nRec5,
-                         'rec6': nRec6,
-                         'rec7': nRec7,
-                         'blockSize': nBytesDeadline}
-        return deadlineBlock
+        and the size of the whole deadline in bytes, given record 3 of the
+        deadline (of the 1st deadline by default).
+        '''
+        if rec3 is None:
+            # Read record 3 of 1st deadline
+            rec3 = self.getRecord3(offset=32)
+
+        return deadlineBlockSize(rec3)
 
     def __readADSOChunk(self, rStart, rData):
         """
@@ -662,7 +2270,8 @@ class adsobin(object):
         # logger.debug('Initial offset: {}'.format(rStart))
         rPad = 4
         rStart = int(rStart)
-        rLength = struct.unpack('@I', rData[rStart:rStart+rPad])[0]
+        rLength = struct.unpack(self.byteorder + 'I',
+                                rData[rStart:rStart+rPad])[0]
         rStart += rPad
         rBinData = rData[rStart:rStart+rLength]
         rEnd = rStart+rLength+rPad      # Final offest
@@ -674,17 +2283,62 @@ class adsobin(object):
         '''
         Return a list with datetime of deadlines.
         '''
-        __deadlines = []
-        for nd in range(len(self)):
-            rec3 = self.getRecord3(nd + 1)
-            dtdeadline = datetime(rec3['ianzer'],
-                                  rec3['imozer'],
-                                  rec3['ijozer'],
-                                  rec3['ihezer'] % 24,
-                                  rec3['imizer'],
-                                  rec3['isezer'],
-                                  tzinfo=timezone(offset=timedelta(hours=0)))
-            if rec3['ihezer'] == 24:
-                dtdeadline = dtdeadline + timedelta(days=1)
-            __deadlines.append(dtdeadline)
-        return __deadlines
+        utc = timezone(offset=timedelta(hours=0))
+        return [dtdeadline.replace(tzinfo=utc)
+                for dtdeadline in self.getDeadlineArray().tolist()]
+
+    def getDeadlineArray(self):
+        '''
+        Return a numpy datetime64[s] array with the (UTC) deadlines.
+        Record 3 of all deadlines is read at once as a strided view.
+        '''
+        if self.__deadlineArray is not None:
+            return self.__deadlineArray
+        ndeadlines = len(self)
+        if ndeadlines == 0:
+            return np.empty(0, dtype='datetime64[s]')
+        dtdeadlines = self.__decodeDeadlines(1, ndeadlines)
+        dtdeadlines.flags.writeable = False
+        self.__deadlineArray = dtdeadlines
+        return dtdeadlines
+
+    def getDeadline(self, deadline=1):
+        '''
+        Return the datetime of a single deadline, reading only its record 3
+        if the deadlines are not known yet.
+        '''
+        if self.__deadlineArray is not None:
+            self.__deadlineOffset(deadline)
+            dtdeadline = self.__deadlineArray[deadline - 1]
+        else:
+            dtdeadline = self.__decodeDeadlines(deadline, 1)[0]
+        return dtdeadline.tolist().replace(
+            tzinfo=timezone(offset=timedelta(hours=0)))
+
+    def __decodeDeadlines(self, deadline, ndeadlines):
+        '''
+        Returns datetime64[s] array of ndeadlines deadlines starting from
+        the 1-based deadline.
+        '''
+        start = self.offset['rec3'] + int(size['pad'] / 2)
+        if self.index['uniform']:
+            num = self.__readArray(self.__deadlineOffset(deadline) + start,
+                                   [27], ndeadlines, dtype=np.int32)
+        else:
+            num = np.stack([self.__readArray(offset + start, [27],
+                                             dtype=np.int32)
+                            for offset in self.index['deadlines'][
+                                deadline - 1:deadline - 1 + ndeadlines]])
+        num = num[:, :6].astype(np.int64)
+
+        # Two-digit years
+        years = np.where(num[:, 2] < 1000, num[:, 2] + 2000, num[:, 2])
+        dtdeadlines = (years - 1970).astype('datetime64[Y]') + \
+            (num[:, 1] - 1).astype('timedelta64[M]')
+        dtdeadlines = dtdeadlines.astype('datetime64[D]') + \
+            (num[:, 0] - 1).astype('timedelta64[D]')
+        # Hours are summed as a time interval so that hour 24 is moved to
+        # midnight of the following day
+        seconds = num[:, 3] * 3600 + num[:, 4] * 60 + num[:, 5]
+        return dtdeadlines.astype('datetime64[s]') + \
+            seconds.astype('timedelta64[s]')
@@ -0,0 +1,281 @@
+###############################################################################
+#
+# arinfopy parser for ADSO/bin files.
+# Copyright (C) 2026 by Simularia s.r.l.
+#                       info@simularia.it
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+#
+#
+# Simularia S.r.l.
+# via Sant'Antonio da Padova 12
+# Torino, Italy
+# www.simularia.it
+# info@simularia.it
+#
+###############################################################################
+
+# Header records of ADSO/BIN files parsed with the struct module only, so
+# that they can be read without importing numpy.
+
+import os
+import struct
+from datetime import datetime, timedelta, timezone
+
+# Size of data type and data padding
+size = {'int': 4,
+        'real': 4,
+        'char8': 8,
+        'pad': (4 + 4)}
+
+# Names of the integers of record 3
+rec3Keys = ('ijozer', 'imozer', 'ianzer', 'ihezer', 'imizer', 'isezer',
+            'ijozei', 'imozei', 'ianzei', 'ihezei', 'imizei', 'isezei',
+            'immai', 'jmmai', 'kmmai', 'nreper', 'nvar3d', 'nvar2d',
+            'nevt', 'itmax', 'nevtpr', 'itmopro', 'IINDEX', 'IKSURF')
+
+
+def detectByteOrder(binData):
+    '''
+    Returns the byte order of an ADSO/BIN file ('<' or '>') from the
+    record markers of record 1 (8 bytes) and record 3 (27 integers), given
+    at least the first 36 bytes of the file.
+    '''
+    for byteorder in ('<', '>'):
+        try:
+            rec1, = struct.unpack(byteorder + 'I', binData[0:4])
+            rec3, = struct.unpack(byteorder + 'I', binData[32:36])
+        except struct.error:
+            break
+        if rec1 == size['char8'] and rec3 == 27 * size['int']:
+            return byteorder
+    raise Exception('ADSOpy error: not an ADSO/BIN file.')
+
+
+def parseRecord3(binData, byteorder):
+    '''
+    Returns dictionary with record 3 parsed from its binary data.
+    '''
+    num = struct.unpack(byteorder + '27i', binData)
+    rec3 = dict(zip(rec3Keys, num))
+    # Two-digit years
+    if rec3['ianzer'] < 1000:
+        rec3['ianzer'] += 2000
+    if rec3['ianzei'] < 1000:
+        rec3['ianzei'] += 2000
+    return rec3
+
+
+def parseRecord4(binData, byteorder, kmmai):
+    '''
+    Returns dictionary with record 4 parsed from its binary data, given
+    the number of levels.
+    '''
+    nReals = 11 + kmmai
+    typedef = byteorder + str(nReals) + 'f'
+    fnum = struct.unpack(typedef, binData)
+    sgrid = fnum[0:kmmai]
+    i = kmmai
+    return {'sgrid': sgrid,
+            'dxmai': fnum[i],
+            'dymai': fnum[i+1],
+            'xlso': fnum[i+2],
+            'ylso': fnum[i+3],
+            'xlatso': fnum[i+4],
+            'ylatso': fnum[i+5],
+            'ztop': fnum[i+10]}
+
+
+def parseRecord5(binData, rec3):
+    '''
+    Returns dictionary with record 5 parsed from its binary data, given
+    record 3 of the deadline.
+    '''
+    def strings(first, n):
+        offset = first * size['char8']
+        return [struct.unpack('@8s', binData[offset+i*8:offset +
+                (i+1)*8])[0].decode('utf-8') for i in range(n)]
+
+    nreper = rec3['nreper']
+    nvar3d = rec3['nvar3d']
+    nvar2d = rec3['nvar2d']
+    return {'nomvar3d': strings(nreper, nvar3d),
+            'univar3d': strings(nreper + nvar3d, nvar3d),
+            'nomvar2d': strings(nreper + 2 * nvar3d, nvar2d),
+            'univar2d': strings(nreper + 2 * nvar3d + nvar2d, nvar2d)}
+
+
+def deadlineBlockSize(rec3):
+    '''
+    Returns dictionary with the size of each record in bytes
+    and the size of the whole deadline in bytes, given record 3 of the
+    deadline.
+    '''
+    nRec1 = size['char8'] + size['pad']
+    nRec2 = size['char8'] + size['pad']
+    nRec3 = 27 * size['int'] + size['pad']
+    nRec4 = (11 + rec3['kmmai']) * size['real'] + size['pad']
+    nRec5 = (rec3['nreper'] * size['char8'] +
+             rec3['nvar3d'] * size['char8'] +
+             rec3['nvar3d'] * size['char8'] +
+             rec3['nvar2d'] * size['char8'] +
+             rec3['nvar2d'] * size['char8']) + size['pad']
+    if rec3['nreper'] != 0:
+        nRec6 = 3 * rec3['nreper'] * size['real'] + size['pad']
+    else:
+        nRec6 = 0
+    nRec7 = (rec3['nvar3d'] * (size['pad'] + rec3['immai'] *
+             rec3['jmmai'] * rec3['kmmai'] * size['real']) +
+             rec3['nvar2d'] * (size['pad'] + rec3['immai'] *
+             rec3['jmmai'] * size['real']))
+
+    nBytesDeadline = (nRec1 + nRec2 + nRec3 + nRec4 + nRec5 + nRec6 +
+                      nRec7)
+    return {'rec1': nRec1,
+            'rec2': nRec2,
+            'rec3': nRec3,
+            'rec4': nRec4,
+            'rec5': nRec5,
+            'rec6': nRec6,
+            'rec7': nRec7,
+            'blockSize': nBytesDeadline}
+
+
+def deadlineDatetime(rec3):
+    '''
+    Returns the (UTC) datetime of a deadline given its record 3.
+    Hours are summed as a time interval so that hour 24 is moved to
+    midnight of the following day.
+    '''
+    year = rec3['ianzer']
+    # Two-digit years
+    if year < 1000:
+        year += 2000
+    return datetime(year, rec3['imozer'], rec3['ijozer'],
+                    tzinfo=timezone(offset=timedelta(hours=0))) + \
+        timedelta(hours=rec3['ihezer'], minutes=rec3['imizer'],
+                  seconds=rec3['isezer'])
+
+
+class adsoheader(object):
+    '''Class to read the headers of an ADSO/BIN file without numpy.'''
+
+    def __init__(self, filename):
+        '''
+        Constructor: read the header records of the first and of the last
+        deadline of the file, assuming that all the deadlines have the
+        same size. The attribute uniform is False if the file is not made
+        of whole deadlines like the first one: use adsobin to read it.
+        '''
+        self.filename = filename
+        fileSize = os.path.getsize(filename)
+        with open(filename, 'rb') as f:
+            self.byteorder = detectByteOrder(f.read(36))
+            header = self.__readHeader(f, 0)
+            self.size = deadlineBlockSize(header['rec3'])
+            blockSize = self.size['blockSize']
+            self.__ndeadlines = fileSize // blockSize
+            uniform = fileSize % blockSize == 0
+            if uniform and self.__ndeadlines > 1:
+                try:
+                    last = self.__readHeader(
+                        f, (self.__ndeadlines - 1) * blockSize)
+                    uniform = deadlineBlockSize(last['rec3']) == \
+                        self.size and last['rec5'] == header['rec5']
+                except Exception:
+                    # No complete header at the last deadline
+                    uniform = False
+        self.uniform = uniform
+        self.index = header
+
+    def __readRecord(self, f, start=None):
+        '''
+        Returns the data of the record at offset start (or at the current
+        position) of the open file f.
+        '''
+        if start is not None:
+            f.seek(start)
+        marker = f.read(size['int'])
+        if len(marker) < size['int']:
+            raise Exception('ADSOpy error: unexpected end of file.')
+        rLength, = struct.unpack(self.byteorder + 'I', marker)
+        binData = f.read(rLength)
+        if len(binData) < rLength or f.read(size['int']) != marker:
+            raise Exception('ADSOpy error: inconsistent record markers.')
+        return binData
+
+    def __readHeader(self, f, start):
+        '''
+        Returns dictionary with records 1 to 5 of the deadline at offset
+        start of the open file f.
+        '''
+        rec1 = self.__readRecord(f, start)
+        rec2 = self.__readRecord(f)
+        rec3 = parseRecord3(self.__readRecord(f), self.byteorder)
+        rec4 = parseRecord4(self.__readRecord(f), self.byteorder,
+                            rec3['kmmai'])
+        rec5 = parseRecord5(self.__readRecord(f), rec3)
+        return {'rec1': struct.unpack('@8s', rec1)[0].decode('utf-8'),
+                'rec2': struct.unpack('@8s', rec2)[0].decode('utf-8'),
+                'rec3': rec3, 'rec4': rec4, 'rec5': rec5}
+
+    def __len__(self):
+        '''
+        Get number of deadlines.
+        '''
+        return self.__ndeadlines
+
+    def getVersion(self):
+        '''
+        Returns string with ADSO/BIN fileversion
+        '''
+        header = self.index['rec1']
+        return '0' if header == 'BBBBBBBB' else header[-3:]
+
+    def getRecord3(self, deadline=1):
+        '''
+        Read record 3 of a (1-based) deadline.
+        '''
+        if deadline < 1 or deadline > len(self):
+            raise ValueError('deadline {} out of range [1, {}].'.format(
+                deadline, len(self)))
+        start = (deadline - 1) * self.size['blockSize'] + \
+            self.size['rec1'] + self.size['rec2']
+        with open(self.filename, 'rb') as f:
+            return parseRecord3(self.__readRecord(f, start), self.byteorder)
+
+    def getDeadline(self, deadline=1):
+        '''
+        Return the datetime of a single deadline, reading only its
+        record 3.
+        '''
+        return deadlineDatetime(self.getRecord3(deadline))
+
+    def getDeadlines(self):
+        '''
+        Return a list with datetime of deadlines, reading record 3 of each
+        deadline.
+        '''
+        start = self.size['rec1'] + self.size['rec2']
+        dtdeadlines = []
+        with open(self.filename, 'rb') as f:
+            for nd in range(len(self)):
+                binData = self.__readRecord(
+                    f, nd * self.size['blockSize'] + start)
+                dtdeadlines.append(deadlineDatetime(
+                    parseRecord3(binData, self.byteorder)))
+        return dtdeadlines
@@ -0,0 +1,240 @@
+###############################################################################
+#
+# arinfopy parser for ADSO/bin files.
+# Copyright (C) 2026 by Simularia s.r.l.
+#                       info@simularia.it
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+#
+#
+# Simularia S.r.l.
+# via Sant'Antonio da Padova 12
+# Torino, Italy
+# www.simularia.it
+# info@simularia.it
+#
+###############################################################################
+
+import glob
+from collections import OrderedDict
+from datetime import timedelta, timezone
+from types import MappingProxyType
+
+import numpy as np
+
+from .adsobinapi import adsobin, deadlineSlice
+from .adsostats import adsostats
+
+
+class adsoseries(object):
+    '''Class to read a series of ADSO/BIN files as a single dataset.'''
+
+    # Header values which must be the same in all the files
+    rec3Keys = ('immai', 'jmmai', 'kmmai', 'nvar3d', 'nvar2d')
+    rec4Keys = ('sgrid', 'dxmai', 'dymai', 'xlso', 'ylso', 'ztop')
+    rec5Keys = ('nomvar3d', 'nomvar2d')
+
+    def __init__(self, filenames, storage='mmap', maxOpen=16, stats=False):
+        '''
+        Constructor: index a list of ADSO/BIN files.
+
+        filenames is a list of file names or glob patterns (or a single
+        pattern). Files are sorted by their first deadline: grids and
+        variables must be the same in all the files and deadlines must not
+        overlap. At most maxOpen files are kept open at the same time and
+        only the files intersecting the requested deadlines are opened.
+        If stats is True (or an adsostats object) the statistics of all the
+        files are accumulated in the stats attribute (see adsobin).
+        '''
+        if isinstance(filenames, str):
+            filenames = [filenames]
+        paths = []
+        for filename in filenames:
+            paths += sorted(glob.glob(filename)) or [filename]
+        if len(paths) == 0:
+            raise ValueError('No ADSO/BIN files given.')
+
+        self.storage = storage
+        self.maxOpen = maxOpen
+        self.stats = None
+        if stats:
+            self.stats = stats if isinstance(stats, adsostats) \
+                else adsostats()
+        self.__files = OrderedDict()
+
+        # Read header and deadlines of each file
+        headers = []
+        for path in paths:
+            with adsobin(path, storage, stats=self.stats) as data:
+                headers.append((data.getDeadlineArray(), path, data.index))
+        headers.sort(key=lambda header: header[0][0] if len(header[0])
+                     else np.datetime64('NaT'))
+
+        first = headers[0][2]
+        for deadlines, path, index in headers[1:]:
+            for rec, keys in (('rec3', self.rec3Keys),
+                              ('rec4', self.rec4Keys),
+                              ('rec5', self.rec5Keys)):
+                for key in keys:
+                    if index[rec][key] != first[rec][key]:
+                        raise ValueError('{} of {} does not match {}.'.format(
+                            key, path, headers[0][1]))
+
+        deadlines = np.concatenate([header[0] for header in headers])
+        if np.any(np.diff(deadlines) <= np.timedelta64(0, 's')):
+            raise ValueError('Deadlines of the files overlap.')
+        deadlines.flags.writeable = False
+        ndeadlines = np.cumsum([0] + [len(header[0]) for header in headers])
+
+        self.filenames = tuple(header[1] for header in headers)
+        self.index = MappingProxyType({
+            'rec3': first['rec3'],
+            'rec4': first['rec4'],
+            'rec5': first['rec5'],
+            'variables': first['variables'],
+            'deadlines': deadlines,
+            'files': tuple(zip(ndeadlines[:-1].tolist(),
+                               ndeadlines[1:].tolist()))})
+
+    def close(self):
+        '''
+        Close all the open files.
+        '''
+        while self.__files:
+            self.__files.popitem()[1].close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        '''
+        Get number of deadlines.
+        '''
+        return len(self.index['deadlines'])
+
+    def __open(self, position):
+        '''
+        Returns the adsobin object of the file in position, opening it
+        if needed.
+        '''
+        if position in self.__files:
+            self.__files.move_to_end(position)
+        else:
+            self.__files[position] = adsobin(self.filenames[position],
+                                             self.storage, stats=self.stats)
+            if len(self.__files) > self.maxOpen:
+                self.__files.popitem(last=False)[1].close()
+        return self.__files[position]
+
+    def __locate(self, deadline):
+        '''
+        Returns file position and local deadline (both 0-based) of the
+        0-based deadline of the series.
+        '''
+        for position, (start, stop) in enumerate(self.index['files']):
+            if start <= deadline < stop:
+                return position, deadline - start
+        raise ValueError('deadline {} out of range [1, {}].'.format(
+            deadline + 1, len(self)))
+
+    def __split(self, time):
+        '''
+        Returns list of (file position, local slice) covering the time
+        slice of the series, in the order of the slice.
+        '''
+        time = deadlineSlice(time, self.getDeadlineArray)
+        selected = np.arange(len(self))[time]
+        step = time.step or 1
+        parts = []
+        for position, (start, stop) in enumerate(self.index['files']):
+            local = selected[(selected >= start) & (selected < stop)] - start
+            if len(local) > 0:
+                last = int(local[-1]) + (1 if step > 0 else -1)
+                parts.append((position, slice(int(local[0]), None if last < 0
+                                              else last, step)))
+        # Negative steps walk the files backwards
+        if step < 0:
+            parts.reverse()
+        return parts
+
+    def getDeadlineArray(self):
+        '''
+        Return a numpy datetime64[s] array with the (UTC) deadlines.
+        '''
+        return self.index['deadlines']
+
+    def getDeadlines(self):
+        '''
+        Return a list with datetime of deadlines.
+        '''
+        utc = timezone(offset=timedelta(hours=0))
+        return [dtdeadline.replace(tzinfo=utc)
+                for dtdeadline in self.getDeadlineArray().tolist()]
+
+    def getDataset(self, variable, time=None, x=None, y=None, z=None,
+                   copy=False, dtype=None):
+        '''
+        Return data of the requested variable over the whole series, as
+        numpy array shaped as adsobin.getDataset.
+        Arguments are the same of adsobin.getDataset: only the files
+        intersecting the time slice are opened.
+        '''
+        if variable not in self.index['variables']:
+            raise ValueError('variable {} does not exist.'.format(variable))
+        split = self.__split(time)
+        if len(split) == 1:
+            position, local = split[0]
+            return self.__open(position).getDataset(variable, local, x, y, z,
+                                                    copy, dtype)
+        elif len(split) == 0:
+            data = self.__open(0).getDataset(variable, slice(0, 0), x, y, z)
+            return data.astype(dtype or np.float32)
+        parts = [self.__open(position).getDataset(variable, local, x, y, z)
+                 for position, local in split]
+        # Concatenated arrays are owned and in native byte order
+        return np.concatenate(parts, dtype=dtype or np.float32)
+
+    def getSlice(self, variable, slice=1, deadline=1, copy=False,
+                 dtype=None):
+        '''
+        Read a slice of data from a given (1-based) deadline of the series.
+        See adsobin.getSlice.
+        '''
+        position, local = self.__locate(deadline - 1)
+        return self.__open(position).getSlice(variable, slice, local + 1,
+                                              copy, dtype)
+
+    def getHeader(self, deadline=1):
+        '''
+        Returns dictionary with records 1 to 5 of a (1-based) deadline of
+        the series. See adsobin.getHeader.
+        '''
+        position, local = self.__locate(deadline - 1)
+        return self.__open(position).getHeader(local + 1)
+
+    def iterDeadlines(self, variables=None, time=None, prefetch=0):
+        '''
+        Iterate over the deadlines of the series yielding
+        (datetime, {variable: array}). See adsobin.iterDeadlines.
+        '''
+        for position, local in self.__split(time):
+            for item in self.__open(position).iterDeadlines(variables, local,
+                                                            prefetch):
+                yield item
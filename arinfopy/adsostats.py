@@ -0,0 +1,126 @@
+###############################################################################
+#
+# arinfopy parser for ADSO/bin files.
+# Copyright (C) 2026 by Simularia s.r.l.
+#                       info@simularia.it
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+#
+#
+# Simularia S.r.l.
+# via Sant'Antonio da Padova 12
+# Torino, Italy
+# www.simularia.it
+# info@simularia.it
+#
+###############################################################################
+
+import threading
+from time import perf_counter
+
+
+class adsostats(object):
+    '''Counters and timers of the I/O of adsobin and adsowritebin.'''
+
+    # Counters, in the order of the report
+    counters = (('bytesRead', 'Bytes read'),
+                ('bytesWritten', 'Bytes written'),
+                ('recordsParsed', 'Records parsed'),
+                ('recordsWritten', 'Records written'),
+                ('cacheHits', 'Cache hits'),
+                ('cacheMisses', 'Cache misses'))
+
+    def __init__(self):
+        '''
+        Constructor: all counters and timers start from zero.
+        The same object can be shared by many adsobin and adsowritebin
+        objects and by many threads.
+        '''
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        Reset all counters and timers.
+        '''
+        with self.__lock:
+            for counter, label in self.counters:
+                setattr(self, counter, 0)
+            # Method name: [calls, cumulative time in seconds]
+            self.methods = {}
+
+    def add(self, **counters):
+        '''
+        Increment the given counters, e.g. add(bytesRead=8, cacheHits=1).
+        '''
+        with self.__lock:
+            for counter, value in counters.items():
+                setattr(self, counter, getattr(self, counter) + value)
+
+    def wrap(self, name, method, count=None):
+        '''
+        Returns method wrapped to accumulate its calls and its time
+        (including the methods it calls) under name. If count is given,
+        it is called with the result of each call and returns the counters
+        to be incremented as a dictionary.
+        '''
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            elapsed = perf_counter() - start
+            with self.__lock:
+                timer = self.methods.setdefault(name, [0, 0.0])
+                timer[0] += 1
+                timer[1] += elapsed
+            if count is not None:
+                self.add(**count(result))
+            return result
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    def asDict(self):
+        '''
+        Returns the counters and the timers as a dictionary.
+        '''
+        with self.__lock:
+            stats = {counter: getattr(self, counter)
+                     for counter, label in self.counters}
+            stats['methods'] = {name: {'calls': calls, 'seconds': seconds}
+                                for name, (calls, seconds) in
+                                self.methods.items()}
+        return stats
+
+    def report(self):
+        '''
+        Returns the counters and the timers formatted as text.
+        '''
+        stats = self.asDict()
+        lines = ['--- arinfopy statistics ---']
+        for counter, label in self.counters:
+            lines.append('{:<28s}: {}'.format(label, stats[counter]))
+        lines.append('{:<28s}  {:>8s} {:>12s}'.format(
+            'Method', 'calls', 'time (s)'))
+        for name, timer in sorted(stats['methods'].items(),
+                                  key=lambda item: -item[1]['seconds']):
+            lines.append('{:<28s}  {:>8d} {:>12.6f}'.format(
+                name, timer['calls'], timer['seconds']))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.report()
@@ -30,23 +30,80 @@
 ###############################################################################
 
 import argparse
+import contextlib
+import glob
+import io
+import json
 import logging
 import os
-from datetime import datetime, timedelta
-import pkg_resources
+import sys
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version as pkgversion
 
-from ..adsobinapi import adsobin
+from ..adsoheaderapi import adsoheader
 
 
 def arinfopy():
+    if len(sys.argv) > 1 and sys.argv[1] == 'extract':
+        return extract(sys.argv[2:])
+
     parser = argparse.ArgumentParser(description='arinfopy parser for '
-                                     'ADSO/bin files.')
-    parser.add_argument('inifile', help='File to be parsed')
+                                     'ADSO/bin files.',
+                                     epilog="Use 'arinfopy extract -h' to "
+                                     "extract a subset of a file.")
+    parser.add_argument('inifile', nargs='+',
+                        help='Files (or glob patterns) to be parsed')
     parser.add_argument('-minmax',
                         help="Show min/max values for each deadline",
                         action="store_true")
     parser.add_argument('-deadlines',
                         help="Show deadlines", action="store_true")
+    parser.add_argument('-exceedances', '--exceedances', metavar='VARIABLE',
+                        help='Count in each grid cell the deadlines with '
+                        'VARIABLE above each of --thresholds')
+    parser.add_argument('--thresholds', type=float, nargs='+',
+                        metavar='THRESHOLD',
+                        help='Thresholds of -exceedances.')
+    parser.add_argument('--period', choices=('day', 'month'),
+                        help='Count the days or months with the aggregated '
+                        'value of VARIABLE above the thresholds.')
+    parser.add_argument('--statistic', default='mean',
+                        choices=('mean', 'max', 'min', 'sum'),
+                        help='Aggregation of VARIABLE in each --period.')
+    parser.add_argument('--window', type=float,
+                        help='Aggregate the running mean of VARIABLE over '
+                        'the given hours.')
+    parser.add_argument('--level', type=int,
+                        help='1-based level of 3D VARIABLE (default: all).')
+    parser.add_argument('--allowed', type=int, default=0,
+                        help='Number of exceedances allowed: cells with '
+                        'more exceedances are counted.')
+    parser.add_argument('-index',
+                        help="Use the sidecar index file (written if "
+                        "missing or out of date)", action="store_true")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of parallel jobs: processes working '
+                        'on different files, or threads used by -minmax '
+                        'on a single file.')
+    parser.add_argument('-format', '--format', default='text',
+                        choices=('text', 'json', 'ndjson'),
+                        help='Output format: text, a JSON array or one '
+                        'JSON object per line, printed as soon as each '
+                        'file is completed.')
+    parser.add_argument('-follow', '--follow',
+                        help="Follow a file being written and show new "
+                        "deadlines as they are completed",
+                        action="store_true")
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='Polling interval of -follow in seconds.')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='Stop -follow when the file does not grow for '
+                        'the given seconds.')
+    parser.add_argument('-profile', '--profile',
+                        help="Show I/O statistics and time spent in each "
+                        "method", action="store_true")
     parser.add_argument('-v', '--verbose',
                         help='Increse output verbosity.',
                         action="store_true")
@@ -65,18 +122,242 @@ def arinfopy():
     console.setFormatter(formatter)
     logger.addHandler(console)
 
+    filenames = []
+    for pattern in args.inifile:
+        filenames += sorted(glob.glob(pattern)) or [pattern]
+    if args.follow and (len(filenames) > 1 or args.format != 'text'):
+        parser.error('-follow requires a single file and text output.')
+    if args.exceedances and not args.thresholds:
+        parser.error('-exceedances requires --thresholds.')
+
+    # Exit status is 1 if any file failed
+    failed = False
+    if args.format == 'text' and (len(filenames) == 1 or args.jobs <= 1):
+        for filename in filenames:
+            try:
+                report(filename, args, args.jobs if len(filenames) == 1
+                       else 1)
+            except Exception as e:
+                if args.verbose and len(filenames) == 1:
+                    raise
+                print('arinfopy: {}: {}'.format(filename, e),
+                      file=sys.stderr)
+                failed = True
+        if failed:
+            sys.exit(1)
+        return
+
+    if args.format == 'json':
+        print('[')
+    for n, (output, error) in enumerate(processFiles(filenames, args)):
+        if args.format == 'json':
+            output = ('  ' if n == 0 else ', ') + output
+        print(output, end='' if args.format == 'text' else '\n',
+              flush=True)
+        if error is not None:
+            if args.format == 'text':
+                print(error, file=sys.stderr, flush=True)
+            failed = True
+    if args.format == 'json':
+        print(']')
+    if failed:
+        sys.exit(1)
+
+
+def parseSlice(text):
+    '''
+    Convert START:STOP[:STEP] (or a single index) to a slice.
+    '''
+    try:
+        bounds = [int(bound) if bound else None
+                  for bound in text.split(':')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid range: {}'.format(text))
+    if len(bounds) == 1 and bounds[0] is not None:
+        return slice(bounds[0], bounds[0] + 1)
+    elif 2 <= len(bounds) <= 3:
+        return slice(*bounds)
+    raise argparse.ArgumentTypeError('invalid range: {}'.format(text))
+
+
+def extract(argv):
+    '''
+    Command line tool to extract a subset of an ADSO/BIN file into a new
+    file.
+    '''
+    parser = argparse.ArgumentParser(
+        prog='arinfopy extract',
+        description='Extract variables, a time window and a sub-domain of '
+        'an ADSO/bin file into a new file.')
+    parser.add_argument('inifile', help='File to be parsed')
+    parser.add_argument('outfile', help='File to be written')
+    parser.add_argument('-variables', '--variables', nargs='+',
+                        help='Variables to be extracted (default: all).')
+    parser.add_argument('-start', '--start', type=datetime.fromisoformat,
+                        help='First deadline to be extracted (ISO format).')
+    parser.add_argument('-end', '--end', type=datetime.fromisoformat,
+                        help='Deadline following the last one to be '
+                        'extracted (ISO format).')
+    for axis in ('x', 'y', 'z'):
+        parser.add_argument('-' + axis, type=parseSlice,
+                            metavar='START:STOP[:STEP]',
+                            help='0-based grid points along {} to be '
+                            'extracted, stop excluded.'.format(axis))
+    args = parser.parse_args(argv)
+
+    from ..adsobinapi import adsobin
+    with adsobin(args.inifile) as adata:
+        ndeadlines = adata.extract(args.outfile, args.variables,
+                                   slice(args.start, args.end),
+                                   args.x, args.y, args.z)
+    print('{} deadlines written to {}'.format(ndeadlines, args.outfile))
+
+
+def openFile(filename, args):
+    '''
+    Open an ADSO/BIN file as needed by the command line options.
+    '''
+    # Summary and deadlines of files made of whole deadlines of the same
+    # size only need the headers, which are read without numpy
+    if not (args.follow or args.minmax or args.exceedances or args.index or
+            args.profile):
+        adata = adsoheader(filename)
+        if adata.uniform:
+            return adata
     # Connect to adsobin file
-    mData = adsobin(args.inifile)
+    from ..adsobinapi import adsobin
+    return adsobin(filename, sidecar=args.index, stats=args.profile)
+
+
+def report(filename, args, jobs=1):
+    '''
+    Print out the information about an ADSO/BIN file requested by the
+    command line options.
+    '''
+    mData = openFile(filename, args)
     # Extract information
-    if args.deadlines:
+    if args.follow:
+        follow(mData, args.interval, args.timeout)
+    elif args.deadlines:
         # mData.deadlines()
         deadlines(mData)
     elif args.minmax:
         # mData.minmax()
-        minmax(mData)
+        minmax(mData, jobs)
+    elif args.exceedances:
+        exceedances(mData, args)
     else:
         # mData.summary()
         summary(mData)
+    if args.profile:
+        print('\n' + mData.stats.report())
+
+
+def processFile(filename, args):
+    '''
+    Returns the output for an ADSO/BIN file as a string, either as text or
+    as a JSON object (see describe), and the error message if processing
+    the file failed (None otherwise). JSON errors are also reported in the
+    output.
+    '''
+    error = None
+    if args.format == 'text':
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            try:
+                report(filename, args)
+            except Exception as e:
+                error = 'arinfopy: {}: {}'.format(filename, e)
+        return output.getvalue(), error
+    try:
+        record = describe(openFile(filename, args), args)
+    except Exception as e:
+        error = 'arinfopy: {}: {}'.format(filename, e)
+        record = {'file': filename, 'error': str(e)}
+    return json.dumps(record), error
+
+
+def processFiles(filenames, args):
+    '''
+    Yield the output and error of each file (see processFile) as soon as
+    it is completed. With more than one job files are processed by a pool of
+    processes, and the outputs follow the order of completion.
+    '''
+    if args.jobs <= 1 or len(filenames) == 1:
+        for filename in filenames:
+            yield processFile(filename, args)
+        return
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(processFile, filename, args)
+                   for filename in filenames]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def deadlinePeriod(adata):
+    '''
+    Returns first deadline, last deadline (as naive UTC datetimes) and
+    mean period between deadlines in seconds.
+    '''
+    firstdl = adata.getDeadline(1).replace(tzinfo=None)
+    lastdl = adata.getDeadline(len(adata)).replace(tzinfo=None)
+    ndeadlines = len(adata)
+    if ndeadlines == 1:
+        dtsecs = 0
+    else:
+        dtsecs = (lastdl - firstdl).total_seconds() / (ndeadlines - 1)
+    return firstdl, lastdl, dtsecs
+
+
+def describe(adata, args):
+    '''
+    Returns dictionary with the information about an ADSO/BIN file to be
+    printed as JSON: the summary, the list of deadlines with -deadlines,
+    the min/max values of each variable over all the deadlines with
+    -minmax and the summary of the exceedances with -exceedances.
+    '''
+    rec3 = adata.index['rec3']
+    rec4 = adata.index['rec4']
+    rec5 = adata.index['rec5']
+    firstdl, lastdl, dtsecs = deadlinePeriod(adata)
+    record = {
+        'file': adata.filename,
+        'version': adata.getVersion(),
+        'generator': adata.index['rec2'].strip(),
+        'firstDeadline': firstdl.isoformat(),
+        'lastDeadline': lastdl.isoformat(),
+        'period': dtsecs,
+        'deadlines': len(adata),
+        'grid': {'nx': rec3['immai'], 'ny': rec3['jmmai'],
+                 'nz': rec3['kmmai'],
+                 'dx': rec4['dxmai'], 'dy': rec4['dymai'],
+                 'xlso': rec4['xlso'], 'ylso': rec4['ylso'],
+                 'xlatso': rec4['xlatso'], 'ylatso': rec4['ylatso'],
+                 'ztop': rec4['ztop'], 'sgrid': list(rec4['sgrid'])},
+        'variables3d': {name.strip(): unit.strip() for name, unit in
+                        zip(rec5['nomvar3d'], rec5['univar3d'])},
+        'variables2d': {name.strip(): unit.strip() for name, unit in
+                        zip(rec5['nomvar2d'], rec5['univar2d'])}}
+    if args.deadlines:
+        record['datetimes'] = [dtdeadline.replace(tzinfo=None).isoformat()
+                               for dtdeadline in adata.getDeadlines()]
+    if args.minmax:
+        import numpy as np
+        record['minmax'] = {name: [float(np.nanmin(values[:, 0])),
+                                   float(np.nanmax(values[:, 1]))]
+                            for name, values in adata.getMinMax().items()}
+    if args.exceedances:
+        record['exceedances'] = {
+            'variable': args.exceedances, 'period': args.period,
+            'statistic': args.statistic, 'window': args.window,
+            'level': args.level, 'allowed': args.allowed,
+            'counts': [{'threshold': threshold, 'max': maxcount,
+                        'cells': ncells}
+                       for threshold, maxcount, ncells in
+                       exceedanceCounts(adata, args)]}
+    if getattr(adata, 'stats', None) is not None:
+        record['stats'] = adata.stats.asDict()
+    return record
 
 
 def deadlines(adata):
@@ -84,101 +365,134 @@ def deadlines(adata):
     Print out list of deadlines in ADSO/BIN file.
     '''
     print('\n--- ADSO/bin file info ---')
-    for nd in range(len(adata)):
-        rec3 = adata.getRecord3(nd + 1)
-        dtdeadline = datetime(rec3['ianzer'],
-                              rec3['imozer'],
-                              rec3['ijozer'],
-                              rec3['ihezer'] % 24,
-                              rec3['imizer'],
-                              rec3['isezer'])
-        if rec3['ihezer'] == 24:
-            dtdeadline = dtdeadline + timedelta(days=1)
+    for nd, dtdeadline in enumerate(adata.getDeadlines()):
         print('{} {:>3d} {}'.format(
             os.path.basename(adata.filename),
             nd + 1,
             dtdeadline.strftime('%d/%m/%Y h %H:%M:%S')))
 
 
-def minmax(adata):
+def follow(adata, interval=1.0, timeout=None):
+    '''
+    Print out the deadlines in ADSO/BIN file and then the new ones as they
+    are written to the file.
+    '''
+    deadlines(adata)
+    name = os.path.basename(adata.filename)
+    try:
+        for nd, dtdeadline in adata.follow(interval, timeout):
+            print('{} {:>3d} {}'.format(
+                name, nd, dtdeadline.strftime('%d/%m/%Y h %H:%M:%S')),
+                flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+def minmax(adata, jobs=1):
     '''
     Print out min/max values for each deadline in ADSO/BIN file.
+    Deadlines are reduced by a pool of jobs threads.
     '''
-    print('\n--- ADSO/bin file info ---')
-    for nd in range(len(adata)):
-        rec3 = adata.getRecord3(nd + 1)
-        rec5 = adata.getRecord5(nd + 1)
+    def minmaxDeadline(nd):
+        # Variables change only in files with deadlines of different layout
+        if adata.index['uniform']:
+            rec5 = adata.index['rec5']
+        else:
+            rec5 = adata.getRecord5(nd + 1)
+        # Reductions on views of the file release the GIL
         rec7 = adata.getRecord7(nd + 1)
-        dtdeadline = datetime(rec3['ianzer'],
-                              rec3['imozer'],
-                              rec3['ijozer'],
-                              rec3['ihezer'] % 24,
-                              rec3['imizer'],
-                              rec3['isezer'])
-        if rec3['ihezer'] == 24:
-            dtdeadline = dtdeadline + timedelta(days=1)
-        print('-' * 70)
-        print('Fields read at deadline # {:>3d}: {}'
-              .format(nd + 1, dtdeadline.strftime('%d/%m/%Y %H:%M:%S')))
-        print('-' * 70)
-        for n3d, name in enumerate(rec5['nomvar3d']):
-            print(('3D # {:>3d}: {:>10s}  min = {:12.4f} max = {:12.4f} ' +
-                   ' [{:s}])').
-                  format(n3d + 1,
-                         name.strip(),
-                         min(rec7[name]),
-                         max(rec7[name]),
-                         rec5['univar3d'][n3d].strip()))
-        for n2d, name in enumerate(rec5['nomvar2d']):
-            print(('2D # {:>3d}: {:>10s}  min = {:12.4f} max = {:12.4f} ' +
-                   ' [{:s}]').
-                  format(n2d + 1,
-                         name.strip(),
-                         min(rec7[name]),
-                         max(rec7[name]),
-                         rec5['univar2d'][n2d].strip()))
+        return rec5, [(field.min(), field.max()) for field in rec7.values()]
+
+    print('\n--- ADSO/bin file info ---')
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        results = pool.map(minmaxDeadline, range(len(adata)))
+        for nd, (dtdeadline, (rec5, values)) in enumerate(
+                zip(adata.getDeadlines(), results)):
+            print('-' * 70)
+            print('Fields read at deadline # {:>3d}: {}'
+                  .format(nd + 1, dtdeadline.strftime('%d/%m/%Y %H:%M:%S')))
+            print('-' * 70)
+            for n3d, name in enumerate(rec5['nomvar3d']):
+                print(('3D # {:>3d}: {:>10s}  min = {:12.4f} '
+                       'max = {:12.4f}  [{:s}])').
+                      format(n3d + 1,
+                             name.strip(),
+                             *values[n3d],
+                             rec5['univar3d'][n3d].strip()))
+            for n2d, name in enumerate(rec5['nomvar2d']):
+                print(('2D # {:>3d}: {:>10s}  min = {:12.4f} '
+                       'max = {:12.4f}  [{:s}]').
+                      format(n2d + 1,
+                             name.strip(),
+                             *values[len(rec5['nomvar3d']) + n2d],
+                             rec5['univar2d'][n2d].strip()))
+
+
+def exceedanceCounts(adata, args):
+    '''
+    Returns (threshold, maximum count, number of cells with more than
+    args.allowed exceedances) for each threshold of -exceedances.
+    '''
+    counts = adata.getExceedances(
+        args.exceedances, args.thresholds, args.period, args.statistic,
+        args.window, args.level)[args.exceedances]
+    return [(threshold, int(count.max()), int((count > args.allowed).sum()))
+            for threshold, count in zip(args.thresholds, counts)]
+
+
+def exceedances(adata, args):
+    '''
+    Print out the exceedances of a variable over each threshold.
+    '''
+    if args.exceedances not in adata.index['variables']:
+        raise ValueError('variable {} does not exist.'.format(
+            args.exceedances))
+    rec5 = adata.index['rec5']
+    units = {name.strip(): unit.strip() for name, unit in
+             zip(rec5['nomvar3d'] + rec5['nomvar2d'],
+                 rec5['univar3d'] + rec5['univar2d'])}
+    unit = units.get(args.exceedances, '')
+    value = '{} [{}]'.format(args.exceedances, unit)
+    if args.window is not None:
+        value = '{:g}-hour running mean of {}'.format(args.window, value)
+    if args.period is None:
+        counted = 'Deadlines'
+    else:
+        counted = {'day': 'Days', 'month': 'Months'}[args.period]
+        value = '{} {} of {}'.format(
+            {'day': 'daily', 'month': 'monthly'}[args.period],
+            args.statistic, value)
+    print('\n--- ADSO/bin file info ---')
+    print('{} with {} above threshold'.format(counted, value))
+    if args.level is not None:
+        print('Level                       : {}'.format(args.level))
+    print('{:>14s} {:>12s} {:>14s}'.format(
+        'Threshold', 'Max count', 'Cells > {}'.format(args.allowed)))
+    for threshold, maxcount, ncells in exceedanceCounts(adata, args):
+        print('{:>14.4f} {:>12d} {:>14d}'.format(threshold, maxcount, ncells))
 
 
 def summary(adata):
     '''
     Print out summary information about ADSO/BIN file.
     '''
-    # Read rec3 of first deadline
-    rec3 = adata.getRecord3(1)
-    firstdl = datetime(rec3['ianzer'],
-                       rec3['imozer'],
-                       rec3['ijozer'],
-                       rec3['ihezer'] % 24,
-                       rec3['imizer'],
-                       rec3['isezer'])
-    if rec3['ihezei'] == 24:
-        firstdl = firstdl + timedelta(days=1)
-
-    # Read rec3, rec4, rec5 of last deadline
-    rec3 = adata.getRecord3(len(adata))
-    rec4 = adata.getRecord4(len(adata))
-    rec5 = adata.getRecord5(len(adata))
-    lastdl = datetime(rec3['ianzer'],
-                      rec3['imozer'],
-                      rec3['ijozer'],
-                      rec3['ihezer'] % 24,
-                      rec3['imizer'],
-                      rec3['isezer'])
-    if rec3['ihezer'] == 24:
-        lastdl = lastdl + timedelta(days=1)
+    # Header records are the same for all the deadlines
+    rec3 = adata.index['rec3']
+    rec4 = adata.index['rec4']
+    rec5 = adata.index['rec5']
+    firstdl, lastdl, dtsecs = deadlinePeriod(adata)
     ndeadlines = len(adata)
-    if ndeadlines == 1:
-        dtsecs = 0
-    else:
-        dtsecs = (lastdl - firstdl).total_seconds() / (ndeadlines - 1)
 
-    version = pkg_resources.require("arinfopy")[0].version
+    try:
+        version = pkgversion('arinfopy')
+    except PackageNotFoundError:
+        version = 'unknown'
     print('\n')
     print('--- ADSO/bin file info (arinfopy v{}) ---'.format(version))
     print('Input archive               : {}'.format(
         os.path.basename(adata.filename)))
     print('Version                     : {}'.format(adata.getVersion()))
-    print('File generator              : {}'.format(adata.getRecord2(1)))
+    print('File generator              : {}'.format(adata.index['rec2']))
     print('First deadline              : {}'.format(firstdl.isoformat()))
     print('Last deadline               : {}'.format(lastdl.isoformat()))
     print('Deadline period (s)         : {}'.format(dtsecs))
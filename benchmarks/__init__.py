@@ -0,0 +1,38 @@
+###############################################################################
+#
+# arinfopy parser for ADSO/bin files.
+# Copyright (C) 2026 by Simularia s.r.l.
+#                       info@simularia.it
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+#
+#
+# Simularia S.r.l.
+# via Sant'Antonio da Padova 12
+# Torino, Italy
+# www.simularia.it
+# info@simularia.it
+#
+###############################################################################
+
+'''
+Benchmark suite of arinfopy: run with
+
+    python -m benchmarks
+
+to write synthetic ADSO/BIN files and time reading and writing them.
+'''
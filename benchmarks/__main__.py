@@ -0,0 +1,104 @@
+###############################################################################
+#
+# arinfopy parser for ADSO/bin files.
+# Copyright (C) 2026 by Simularia s.r.l.
+#                       info@simularia.it
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+#
+#
+# Simularia S.r.l.
+# via Sant'Antonio da Padova 12
+# Torino, Italy
+# www.simularia.it
+# info@simularia.it
+#
+###############################################################################
+
+import argparse
+import json
+import sys
+import tempfile
+
+from .suite import benchmarks, header, run, sizes
+
+
+def formatResult(result, baseline=None):
+    '''
+    Returns a line of the table of results.
+    '''
+    line = '{:<8s} {:<14s} {:>10.4f} s'.format(
+        result['size'], result['benchmark'], result['seconds'])
+    if result['MBps'] is not None:
+        line += ' {:>10.1f} MB/s'.format(result['MBps'])
+    else:
+        line += ' ' * 16
+    line += ' {:>10.1f} MB peak'.format(result['peakMemory'] / 1e6)
+    if baseline is not None:
+        key = (result['size'], result['benchmark'])
+        if key in baseline and result['seconds'] > 0:
+            line += '  x{:.2f} vs baseline'.format(
+                baseline[key]['seconds'] / result['seconds'])
+    return line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Benchmark arinfopy on synthetic ADSO/BIN files.')
+    parser.add_argument('-s', '--sizes', nargs='+', choices=list(sizes),
+                        default=['small', 'medium'],
+                        help='Sizes of the synthetic files '
+                        '(default: small medium).')
+    parser.add_argument('-b', '--benchmarks', nargs='+',
+                        choices=list(benchmarks),
+                        help='Benchmarks to run (default: all).')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of timed runs of each benchmark: the '
+                        'best one is reported.')
+    parser.add_argument('-d', '--dir', default=None,
+                        help='Directory of the synthetic files '
+                        '(default: a temporary directory).')
+    parser.add_argument('-o', '--output',
+                        help='Write the results to a JSON file.')
+    parser.add_argument('-c', '--compare',
+                        help='JSON file of a previous run to compare with.')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = {(result['size'], result['benchmark']): result
+                        for result in json.load(f)['results']}
+
+    results = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for result in run(args.sizes, directory, args.repeat,
+                          args.benchmarks):
+            print(formatResult(result, baseline), flush=True)
+            results.append(result)
+
+    if args.output:
+        report = header()
+        report['results'] = results
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
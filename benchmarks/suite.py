@@ -0,0 +1,207 @@
+###############################################################################
+#
+# arinfopy parser for ADSO/bin files.
+# Copyright (C) 2026 by Simularia s.r.l.
+#                       info@simularia.it
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+#
+#
+# Simularia S.r.l.
+# via Sant'Antonio da Padova 12
+# Torino, Italy
+# www.simularia.it
+# info@simularia.it
+#
+###############################################################################
+
+import contextlib
+import os
+import tracemalloc
+from time import perf_counter
+
+from arinfopy import adsobin, adsowritebin
+
+from .synthetic import makeFields, makeFile
+
+# Synthetic files: grid size, number of variables and of deadlines
+sizes = {
+    'small': {'nx': 50, 'ny': 50, 'nz': 5,
+              'nvar3d': 4, 'nvar2d': 4, 'ndeadlines': 24},
+    'medium': {'nx': 150, 'ny': 150, 'nz': 10,
+               'nvar3d': 4, 'nvar2d': 4, 'ndeadlines': 48},
+    'large': {'nx': 300, 'ny': 300, 'nz': 15,
+              'nvar3d': 6, 'nvar2d': 4, 'ndeadlines': 72}}
+
+
+def benchWrite(filename, spec):
+    '''
+    Write the synthetic file with adsowritebin.writeDeadline.
+    '''
+    return makeFile(filename, **spec)
+
+
+def benchPutRecord7(filename, spec):
+    '''
+    Pack the fields of all the deadlines with adsowritebin.putRecord7.
+    '''
+    fields = makeFields(spec['nx'], spec['ny'], spec['nz'],
+                        spec['nvar3d'], spec['nvar2d'])
+    # putRecord7 takes arrays shaped as (z, y, x) in C order
+    rec7 = {'var3d': [field.T for field in fields.values()
+                      if field.ndim == 3],
+            'var2d': [field.T for field in fields.values()
+                      if field.ndim == 2]}
+    writer = adsowritebin()
+    nBytes = 0
+    for nd in range(spec['ndeadlines']):
+        nBytes += len(writer.putRecord7(rec7, spec['nx'], spec['ny'],
+                                        spec['nz']))
+    return nBytes
+
+
+def benchOpen(filename, spec):
+    '''
+    Open the file and build its index.
+    '''
+    adsobin(filename).close()
+
+
+def benchGetDeadlines(filename, spec):
+    '''
+    Open the file and decode its deadlines.
+    '''
+    with adsobin(filename) as data:
+        data.getDeadlines()
+
+
+def benchGetSlice(filename, spec):
+    '''
+    Read the first level of all the variables in all the deadlines with
+    getSlice.
+    '''
+    nBytes = 0
+    with adsobin(filename) as data:
+        for nd in range(len(data)):
+            for name in data.index['fields']:
+                nBytes += data.getSlice(name, 1, nd + 1, copy=True).nbytes
+    return nBytes
+
+
+def benchGetDataset(filename, spec):
+    '''
+    Read all the variables with getDataset.
+    '''
+    nBytes = 0
+    with adsobin(filename) as data:
+        for name in data.index['fields']:
+            nBytes += data.getDataset(name, copy=True).nbytes
+    return nBytes
+
+
+def benchMinMax(filename, spec):
+    '''
+    Print min/max values of all the variables as arinfopy -minmax.
+    '''
+    from arinfopy.cli.arinfopy import minmax
+
+    with adsobin(filename) as data, open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            minmax(data)
+        return data.getDeadlineBlockSize()['rec7'] * len(data)
+
+
+# Benchmarks in order of execution: the file is written by the first one
+benchmarks = {
+    'write': benchWrite,
+    'putRecord7': benchPutRecord7,
+    'open': benchOpen,
+    'getDeadlines': benchGetDeadlines,
+    'getSlice': benchGetSlice,
+    'getDataset': benchGetDataset,
+    'minmax': benchMinMax}
+
+
+def runBenchmark(function, filename, spec, repeat=3):
+    '''
+    Run a benchmark repeat times and returns the dictionary
+        {'seconds': best time, 'bytes': bytes processed or None,
+         'MBps': throughput or None, 'peakMemory': peak memory in bytes}
+    Peak memory is measured with tracemalloc in a separate run, so that
+    tracing does not affect the timings: it counts the memory allocated
+    by Python and numpy, and not the pages of the file mapped in memory.
+    '''
+    seconds = []
+    for n in range(max(repeat, 1)):
+        start = perf_counter()
+        nBytes = function(filename, spec)
+        seconds.append(perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function(filename, spec)
+        peakMemory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    best = min(seconds)
+    return {'seconds': best,
+            'bytes': nBytes,
+            'MBps': nBytes / best / 1e6 if nBytes and best > 0 else None,
+            'peakMemory': peakMemory}
+
+
+def run(names, directory, repeat=3, benchmarkNames=None):
+    '''
+    Run the benchmarks on the synthetic files of the given sizes, written
+    in directory, yielding a result dictionary as soon as each benchmark
+    is completed.
+    '''
+    for name in names:
+        spec = sizes[name]
+        filename = os.path.join(directory, 'synthetic-{}.bin'.format(name))
+        try:
+            for bench, function in benchmarks.items():
+                if benchmarkNames and bench not in benchmarkNames and \
+                        bench != 'write':
+                    continue
+                result = {'size': name, 'benchmark': bench}
+                result.update(spec)
+                result.update(runBenchmark(function, filename, spec, repeat))
+                yield result
+        finally:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+def header():
+    '''
+    Returns dictionary describing the environment of the benchmarks.
+    '''
+    import platform
+
+    from importlib.metadata import PackageNotFoundError, version
+
+    import numpy as np
+    try:
+        arinfopyVersion = version('arinfopy')
+    except PackageNotFoundError:
+        arinfopyVersion = None
+    return {'arinfopy': arinfopyVersion,
+            'numpy': np.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform()}
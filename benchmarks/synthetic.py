@@ -0,0 +1,96 @@
+###############################################################################
+#
+# arinfopy parser for ADSO/bin files.
+# Copyright (C) 2026 by Simularia s.r.l.
+#                       info@simularia.it
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301, USA.
+#
+#
+# Simularia S.r.l.
+# via Sant'Antonio da Padova 12
+# Torino, Italy
+# www.simularia.it
+# info@simularia.it
+#
+###############################################################################
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from arinfopy import adsowritebin
+
+
+def makeHeader(nx, ny, nz, nvar3d, nvar2d, deadline=1):
+    '''
+    Returns the header records (as for adsowritebin.writeDeadline) of the
+    1-based hourly deadline of a synthetic file.
+    '''
+    start = datetime(2024, 1, 1)
+    dtdeadline = start + timedelta(hours=deadline)
+    rec3 = {'ijozer': dtdeadline.day, 'imozer': dtdeadline.month,
+            'ianzer': dtdeadline.year, 'ihezer': dtdeadline.hour,
+            'imizer': 0, 'isezer': 0,
+            'ijozei': start.day, 'imozei': start.month,
+            'ianzei': start.year, 'ihezei': start.hour,
+            'imizei': 0, 'isezei': 0,
+            'immai': nx, 'jmmai': ny, 'kmmai': nz, 'nreper': 0,
+            'nvar3d': nvar3d, 'nvar2d': nvar2d, 'nevt': 0, 'itmax': 0,
+            'nevtpr': 0, 'itmopro': 0, 'IINDEX': 1, 'IKSURF': 0}
+    rec4 = {'sgrid': [10.0 * (k + 1) ** 1.5 for k in range(nz)],
+            'dxmai': 100.0, 'dymai': 100.0,
+            'xlso': 390000.0, 'ylso': 4990000.0,
+            'xlatso': 45.0, 'ylatso': 7.6, 'ztop': 1000.0 * nz}
+    rec5 = {'nomvar3d': ['V3D{:<5d}'.format(n) for n in range(nvar3d)],
+            'univar3d': ['ug/m3   '] * nvar3d,
+            'nomvar2d': ['V2D{:<5d}'.format(n) for n in range(nvar2d)],
+            'univar2d': ['ug/m2   '] * nvar2d}
+    return {'rec1': 'BBBBBBBB', 'rec2': 'SYNTH   ',
+            'rec3': rec3, 'rec4': rec4, 'rec5': rec5}
+
+
+def makeFields(nx, ny, nz, nvar3d, nvar2d, seed=0):
+    '''
+    Returns dictionary {variable: array} with random fields shaped as
+    (x, y, z) or (x, y), as for adsowritebin.writeDeadline.
+    '''
+    rng = np.random.default_rng(seed)
+    rec5 = makeHeader(nx, ny, nz, nvar3d, nvar2d)['rec5']
+    fields = {}
+    for name in rec5['nomvar3d']:
+        fields[name] = np.asfortranarray(
+            rng.random((nx, ny, nz), dtype=np.float32))
+    for name in rec5['nomvar2d']:
+        fields[name] = np.asfortranarray(
+            rng.random((nx, ny), dtype=np.float32))
+    return fields
+
+
+def makeFile(filename, nx, ny, nz, nvar3d, nvar2d, ndeadlines, seed=0):
+    '''
+    Write a synthetic ADSO/BIN file with ndeadlines hourly deadlines.
+    The same random fields are written in all the deadlines.
+    Returns the size of the file in bytes.
+    '''
+    fields = makeFields(nx, ny, nz, nvar3d, nvar2d, seed)
+    with adsowritebin(filename) as writer:
+        for nd in range(ndeadlines):
+            writer.writeDeadline(
+                makeHeader(nx, ny, nz, nvar3d, nvar2d, nd + 1), fields)
+    return os.path.getsize(filename)
@@ -14,9 +14,7 @@ setuptools.setup(
     license="GNU GPLv2",
     url="https://github.com/Simularia/arinfopy",
     install_requires=[
-        "numpy>=1.24",
-        "setuptools>=70.0.0"
-
+        "numpy>=1.24"
     ],
     packages=[
         "arinfopy",